@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный бенчмарк FastAPI-сервиса (main.py).
+
+1. Засевает PostgreSQL товарами из "DB(tree-like).txt", размноженными до --rows строк
+   (таблица очищается только с флагом --reset).
+2. По очереди нагружает каждый эндпоинт --concurrency параллельными клиентами.
+   Переключение и удаление трогают только строки, созданные самим бенчмарком;
+   в конце они удаляются, так что данные в таблице остаются как были.
+3. Пишет машиночитаемый отчёт: пропускная способность и p50/p95/p99 по эндпоинтам.
+
+Пример (API должен быть запущен на той же БД):
+    python bench_api.py --rows 100000 --reset --requests 500 --concurrency 16 --out bench_report.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from categorizer import PRODUCT_CATEGORIES, Categorizer, CategoryTree
+from db import DatabaseConfig
+from product_tree import load_product_tree
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DB(tree-like).txt")
+PRODUCT_TREE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_tree_samara.json")
+SEED_BATCH_SIZE = 5000
+
+
+def load_seed_products(path=SEED_FILE):
+    """Пары (название, в холодильнике) из многострочного INSERT в DB(tree-like).txt"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    start = text.index("-- Добавим продукты по категориям")
+    products = re.findall(r"\('([^']+)',\s*(true|false)\)", text[start:])
+    return [(name, flag == "true") for name, flag in products]
+
+
+def build_categorizer():
+    """Тот же словарь, что у API (main.py): дерево товаров, а без него — PRODUCT_CATEGORIES"""
+    path = os.getenv("PRODUCT_TREE_PATH") or PRODUCT_TREE_FILE
+    try:
+        return Categorizer(CategoryTree(load_product_tree(path), os.getenv("CATEGORY_LEVEL", "subcategory"), fallback=PRODUCT_CATEGORIES))
+    except (OSError, ValueError, KeyError):
+        return Categorizer(PRODUCT_CATEGORIES)
+
+
+def seed_database(rows, reset, seed):
+    """Доводит число строк fridge_items до rows; возвращает итоговое количество"""
+    products = load_seed_products()
+    categorizer = build_categorizer()
+    rng = random.Random(seed)
+    conn = psycopg2.connect(**DatabaseConfig.from_env().connect_kwargs())
+    try:
+        with conn.cursor() as cursor:
+            if reset:
+                cursor.execute("TRUNCATE TABLE fridge_items RESTART IDENTITY")
+            cursor.execute("SELECT COUNT(*) FROM fridge_items")
+            existing = cursor.fetchone()[0]
+            missing = max(0, rows - existing)
+            for offset in range(0, missing, SEED_BATCH_SIZE):
+                batch = []
+                for i in range(offset, min(missing, offset + SEED_BATCH_SIZE)):
+                    name, _ = products[i % len(products)]
+                    # Каждая копия получает свой номер, чтобы названия не повторялись
+                    variant = f"{name} #{existing + i + 1}"
+                    batch.append((variant, rng.random() < 0.5, categorizer.categorize(variant)))
+                execute_values(
+                    cursor,
+                    "INSERT INTO fridge_items (name, is_in_fridge, category) VALUES %s",
+                    batch,
+                    page_size=len(batch),
+                )
+                conn.commit()
+            cursor.execute("ANALYZE fridge_items")
+            cursor.execute("SELECT COUNT(*) FROM fridge_items")
+            count = cursor.fetchone()[0]
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+
+def request(method, url, payload=None, timeout=60):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            body = response.read()
+            return response.status, body
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, b""
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Метод ближайшего ранга
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Scenarios:
+    """
+    Запросы к каждому эндпоинту. Изменяющие запросы трогают только строки, которые
+    создал сам бенчмарк: prepare() заранее добавляет строки для переключения и
+    удаления, а cleanup() в конце удаляет всё, что бенчмарк создал и не удалил
+    """
+
+    # Сценарии, которым нужны заранее созданные строки
+    MUTATING = ("toggle_item", "remove_item", "bulk_toggle")
+    # Создаётся пачками не больше MAX_BULK_SIZE API
+    CREATE_BATCH_SIZE = 500
+    TOGGLE_POOL_SIZE = 200
+
+    def __init__(self, base_url, seed):
+        self.base_url = base_url
+        self.rng = random.Random(seed)
+        # Строки бенчмарка: все ещё существующие, для переключения и очередь на удаление
+        self.created_ids = set()
+        self.toggle_ids = []
+        self.removable_ids = []
+        self.lock = threading.Lock()
+        categories = list(build_categorizer().categories)
+        search_terms = ["молоко", "сыр", "яблок", "хлеб", "напитки", "малоко", "курица"]
+        self.all = {
+            "root": lambda: ("GET", "/", None),
+            "database_items_page": lambda: ("GET", "/database-items?limit=100", None),
+            "database_items_full": lambda: ("GET", "/database-items", None),
+            "database_items_stream": lambda: ("GET", "/database-items?stream=true", None),
+            "categories": lambda: ("GET", "/categories", None),
+            "cache_stats": lambda: ("GET", "/categories/cache-stats", None),
+            "filter_by_category": lambda: ("GET", f"/filter-by-category/{self.choice(categories)}", None),
+            "search_products": lambda: ("POST", "/search-products", {"query": self.choice(search_terms)}),
+            "statistics": lambda: ("GET", "/statistics", None),
+            "add_item": lambda: ("POST", "/items/add", {"name": "Бенчмарк молоко", "isInFridge": True}),
+            "toggle_item": lambda: ("PATCH", f"/items/move/{self.toggle_id()}/toggle", None),
+            "remove_item": self.remove_item,
+            "bulk_add": lambda: ("POST", "/items/bulk/add", {
+                "items": [{"name": f"Бенчмарк хлеб {i}", "isInFridge": bool(i % 2)} for i in range(100)]
+            }),
+            "bulk_toggle": lambda: ("PATCH", "/items/bulk/toggle", {
+                "ids": [self.toggle_id() for _ in range(100)]
+            }),
+        }
+
+    def choice(self, values):
+        with self.lock:
+            return self.rng.choice(values)
+
+    def toggle_id(self):
+        with self.lock:
+            return self.rng.choice(self.toggle_ids)
+
+    def remove_item(self):
+        with self.lock:
+            item_id = self.removable_ids.pop()
+            self.created_ids.discard(item_id)
+        return "DELETE", f"/items/remove/{item_id}", None
+
+    def create(self, count):
+        """Добавляет count строк бенчмарка через bulk/add и возвращает их id"""
+        ids = []
+        for offset in range(0, count, self.CREATE_BATCH_SIZE):
+            size = min(self.CREATE_BATCH_SIZE, count - offset)
+            items = [{"name": f"Бенчмарк запас {offset + i}", "isInFridge": True} for i in range(size)]
+            status, body = request("POST", self.base_url + "/items/bulk/add", {"items": items})
+            if status != 200:
+                raise RuntimeError(f"Не удалось создать строки для бенчмарка: HTTP {status}")
+            ids.extend(self.on_response("bulk_add", status, body))
+        return ids
+
+    def prepare(self, names, removals):
+        """Создаёт строки для изменяющих сценариев из names; remove_item удалит removals строк"""
+        if "toggle_item" in names or "bulk_toggle" in names:
+            self.toggle_ids = self.create(self.TOGGLE_POOL_SIZE)
+        if "remove_item" in names:
+            self.removable_ids = self.create(removals)
+
+    def cleanup(self):
+        """Удаляет строки, созданные бенчмарком; возвращает их число"""
+        ids = sorted(self.created_ids)
+        for offset in range(0, len(ids), self.CREATE_BATCH_SIZE):
+            request("DELETE", self.base_url + "/items/bulk/remove", {"ids": ids[offset:offset + self.CREATE_BATCH_SIZE]})
+        self.created_ids.clear()
+        return len(ids)
+
+    def on_response(self, name, status, body):
+        """Запоминает id строк, созданных add_item и bulk_add"""
+        if status != 200 or name not in ("add_item", "bulk_add"):
+            return []
+        data = json.loads(body)
+        if name == "add_item":
+            ids = [data["id"]]
+        else:
+            ids = [result["item"]["id"] for result in data["results"] if result["status"] == "created"]
+        with self.lock:
+            self.created_ids.update(ids)
+        return ids
+
+
+def run_endpoint(scenarios, name, total_requests, concurrency):
+    build = scenarios.all[name]
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(_):
+        method, path, payload = build()
+        started = time.perf_counter()
+        status, body = request(method, scenarios.base_url + path, payload)
+        elapsed = time.perf_counter() - started
+        scenarios.on_response(name, status, body)
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            return len(body)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        response_bytes = sum(executor.map(one, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(total_requests / wall, 2) if wall else None,
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 50)),
+        "p95_ms": to_ms(percentile(latencies, 95)),
+        "p99_ms": to_ms(percentile(latencies, 99)),
+        "max_ms": to_ms(latencies[-1]) if latencies else None,
+        "avg_response_bytes": round(response_bytes / total_requests) if total_requests else 0,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--base_url", type=str, default="http://127.0.0.1:8000/api", help="Адрес API")
+    p.add_argument("--rows", type=int, default=10000, help="Сколько строк должно быть в fridge_items")
+    p.add_argument("--reset", action="store_true", help="Очистить fridge_items перед засевом (TRUNCATE!)")
+    p.add_argument("--skip_seed", action="store_true", help="Не трогать БД, нагружать как есть")
+    p.add_argument("--requests", type=int, default=300, help="Запросов на каждый эндпоинт")
+    p.add_argument("--heavy_requests", type=int, default=20, help="Запросов на полную выгрузку списка")
+    p.add_argument("--concurrency", type=int, default=16, help="Параллельных клиентов")
+    p.add_argument("--endpoints", type=str, default="", help="Через запятую; по умолчанию — все")
+    p.add_argument("--seed", type=int, default=42, help="Сид для воспроизводимости")
+    p.add_argument("--out", type=str, default="bench_report.json", help="Куда сохранить отчёт")
+    args = p.parse_args()
+
+    if args.skip_seed:
+        conn = psycopg2.connect(**DatabaseConfig.from_env().connect_kwargs())
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM fridge_items")
+            rows = cursor.fetchone()[0]
+        conn.close()
+    else:
+        started = time.perf_counter()
+        rows = seed_database(args.rows, args.reset, args.seed)
+        print(f"В таблице {rows} строк (засев {time.perf_counter() - started:.1f} с)")
+    if not rows:
+        sys.exit("Таблица fridge_items пуста — нечего нагружать")
+
+    status, _ = request("GET", args.base_url.rsplit("/", 1)[0] + "/")
+    if status != 200:
+        sys.exit(f"API недоступен по адресу {args.base_url}: HTTP {status}")
+
+    scenarios = Scenarios(args.base_url, args.seed)
+    names = [name for name in args.endpoints.split(",") if name] or list(scenarios.all)
+    unknown = set(names) - set(scenarios.all)
+    if unknown:
+        sys.exit(f"Неизвестные эндпоинты: {sorted(unknown)}; доступны: {list(scenarios.all)}")
+
+    results = {}
+    try:
+        scenarios.prepare(names, args.requests)
+        for name in names:
+            total = args.heavy_requests if name in ("database_items_full", "database_items_stream") else args.requests
+            results[name] = run_endpoint(scenarios, name, total, args.concurrency)
+            r = results[name]
+            print(f"{name:<24} {r['throughput_rps']:>9} rps  p50 {r['p50_ms']:>9} мс  "
+                  f"p95 {r['p95_ms']:>9} мс  p99 {r['p99_ms']:>9} мс  ошибок {r['errors']}")
+    finally:
+        print(f"Удалено строк, созданных бенчмарком: {scenarios.cleanup()}")
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "config": {
+            "base_url": args.base_url,
+            "rows": rows,
+            "requests": args.requests,
+            "heavy_requests": args.heavy_requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "endpoints": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"OK: отчёт сохранён -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
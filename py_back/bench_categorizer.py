@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк категоризации: исходный вложенный цикл против CategoryMatcher.
+
+Пример:
+    python bench_categorizer.py --names 20000 --extra_keywords 3000
+"""
+import argparse
+import random
+import time
+
+from categorizer import PRODUCT_CATEGORIES, CategoryMatcher, categorize_naive
+
+SAMPLE_NAMES = [
+    "Молоко", "Сыр", "Сливочное масло", "Помидоры", "Перец болгарский",
+    "Апельсины", "Колбаса", "Апельсиновый сок", "Вода минеральная",
+    "Чай зеленый", "Хлеб белый", "Булочки", "Яйца куриные", "Шоколад",
+    "Кетчуп томатный острый",
+]
+
+
+def build_dictionary(extra_keywords: int, seed: int):
+    """Словарь PRODUCT_CATEGORIES плюс синтетические категории, чтобы смоделировать рост словаря"""
+    rng = random.Random(seed)
+    alphabet = "абвгдежзийклмнопрстуфхцчшщыэюя"
+    categories = {}
+    per_category = 50
+    for i in range(extra_keywords // per_category):
+        categories[f"категория_{i}"] = [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(5, 10)))
+            for _ in range(per_category)
+        ]
+    categories.update(PRODUCT_CATEGORIES)
+    return categories
+
+
+def measure(label, func, names, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(names)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<32} {best * 1000:9.2f} мс  {best / len(names) * 1e6:8.2f} мкс/название")
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--names", type=int, default=20000, help="Сколько названий категоризировать")
+    p.add_argument("--extra_keywords", type=int, default=0, help="Сколько синтетических ключевых слов добавить")
+    p.add_argument("--repeat", type=int, default=5, help="Число повторов (берётся лучшее время)")
+    p.add_argument("--seed", type=int, default=42, help="Сид для воспроизводимости")
+    args = p.parse_args()
+
+    categories = build_dictionary(args.extra_keywords, args.seed)
+    rng = random.Random(args.seed)
+    names = [rng.choice(SAMPLE_NAMES) for _ in range(args.names)]
+
+    started = time.perf_counter()
+    matcher = CategoryMatcher(categories)
+    build_time = time.perf_counter() - started
+    print(f"Ключевых слов: {matcher.keyword_count}, состояний автомата: {matcher.state_count}, "
+          f"сборка: {build_time * 1000:.1f} мс")
+
+    mismatches = [name for name in set(names) if matcher.categorize(name) != categorize_naive(name, categories)]
+    if mismatches:
+        raise SystemExit(f"Результаты расходятся: {mismatches}")
+
+    naive = measure("categorize_naive", lambda batch: [categorize_naive(n, categories) for n in batch], names, args.repeat)
+    compiled = measure("CategoryMatcher.categorize_many", matcher.categorize_many, names, args.repeat)
+    print(f"Ускорение: x{naive / compiled:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк сериализации списка товаров: путь FastAPI по умолчанию
+(копия строки в dict + jsonable_encoder + JSONResponse) против fast_json.
+
+Строки имитируют RealDictRow из fridge_items (id, name, is_in_fridge,
+created_at, category); у части строк категория не посчитана и
+дополняется при сериализации. Перед замером проверяется, что байты
+ответа совпадают.
+
+Пример:
+    python bench_json.py --rows 10000 --missing_category 0.2
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from categorizer import PRODUCT_CATEGORIES, Categorizer
+from fast_json import dumps_json
+
+SAMPLE_NAMES = [
+    "Молоко", "Сыр", "Сливочное масло", "Помидоры", "Перец болгарский",
+    "Апельсины", "Колбаса", "Апельсиновый сок", "Вода минеральная",
+    "Чай зеленый", "Хлеб белый", "Булочки", "Яйца куриные", "Шоколад",
+    "Кетчуп \"томатный\" острый",
+]
+
+
+def make_rows(count, missing_category, categorizer, seed):
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        name = f"{rng.choice(SAMPLE_NAMES)} {i}"
+        rows.append({
+            "id": i + 1,
+            "name": name,
+            "is_in_fridge": rng.random() < 0.7,
+            "created_at": started + timedelta(seconds=rng.randint(0, 10 ** 7), microseconds=rng.randint(0, 999999)),
+            "category": None if rng.random() < missing_category else categorizer.categorize(name),
+        })
+    return rows
+
+
+def serialize_default(rows, categorize):
+    # Как было в main.py: with_category копировал строку, FastAPI обходил результат jsonable_encoder
+    items = []
+    for row in rows:
+        item = dict(row)
+        if not item.get("category"):
+            item["category"] = categorize(row["name"])
+        items.append(item)
+    return JSONResponse(jsonable_encoder({"count": len(items), "items": items})).body
+
+
+def serialize_fast(rows, categorize):
+    # Как теперь: категория дописывается в строку на месте, строки сразу уходят в C-кодировщик json
+    for row in rows:
+        if not row.get("category"):
+            row["category"] = categorize(row["name"])
+    return dumps_json({"count": len(rows), "items": rows})
+
+
+def measure(label, func, make_batch, categorize, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        # Свежие строки на каждый повтор: быстрый путь меняет их на месте, как строки курсора
+        rows = make_batch()
+        started = time.perf_counter()
+        func(rows, categorize)
+        best = min(best, time.perf_counter() - started)
+    rows_count = len(make_batch())
+    print(f"{label:<34} {best * 1000:9.2f} мс  {best / rows_count * 10000 * 1000:8.2f} мс/10k строк")
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=10000, help="Сколько строк в ответе")
+    p.add_argument("--missing_category", type=float, default=0.2, help="Доля строк без посчитанной категории")
+    p.add_argument("--repeat", type=int, default=5, help="Число повторов (берётся лучшее время)")
+    p.add_argument("--seed", type=int, default=42, help="Сид для воспроизводимости")
+    args = p.parse_args()
+
+    categorizer = Categorizer(PRODUCT_CATEGORIES)
+    rows = make_rows(args.rows, args.missing_category, categorizer, args.seed)
+    make_batch = lambda: [dict(row) for row in rows]
+
+    expected = serialize_default(make_batch(), categorizer.categorize)
+    actual = serialize_fast(make_batch(), categorizer.categorize)
+    if actual != expected:
+        raise SystemExit("Ответы расходятся")
+    print(f"Строк: {args.rows}, тело ответа: {len(expected) / 1024:.1f} КиБ, байты совпадают")
+
+    default = measure("jsonable_encoder + JSONResponse", serialize_default, make_batch, categorizer.categorize, args.repeat)
+    fast = measure("fast_json.dumps_json", serialize_fast, make_batch, categorizer.categorize, args.repeat)
+    print(f"Ускорение: x{default / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
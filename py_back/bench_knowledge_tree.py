@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Память и время загрузки дерева знаний: вложенные словари (json.load) против
+колоночного CompactKnowledgeTree (knowledge_tree.py) и его бинарного снимка (mmap).
+
+Без --input дерево генерируется itr2_GPT.py во временный NDJSON.
+
+Пример:
+    python bench_knowledge_tree.py --num_classes 2000
+    python bench_knowledge_tree.py --input knowledge_tree_sample.json
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from itr2_GPT import iter_knowledge_tree_classes, write_knowledge_tree_stream
+from knowledge_tree import CompactKnowledgeTree, read_knowledge_tree
+
+
+def load_dicts(path):
+    """Дерево в исходном виде — вложенные словари"""
+    header, classes = read_knowledge_tree(path)
+    return {**header, "классы": list(classes)}
+
+
+def measure(label, load, path):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load(path)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} загрузка {elapsed * 1000:9.1f} мс  память {current / 2**20:9.1f} МБ  пик {peak / 2**20:9.1f} МБ")
+    return result, current
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", type=str, default="", help="Готовый JSON/NDJSON дерева знаний")
+    p.add_argument("--num_classes", type=int, default=1000, help="Сколько классов сгенерировать без --input")
+    p.add_argument("--seed", type=int, default=42, help="Сид для воспроизводимости")
+    args = p.parse_args()
+
+    path = args.input
+    fd, snapshot_path = tempfile.mkstemp(suffix=".snap")
+    os.close(fd)
+    if not path:
+        fd, path = tempfile.mkstemp(suffix=".ndjson")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write_knowledge_tree_stream(
+                f, iter_knowledge_tree_classes(num_classes=args.num_classes, seed=args.seed), ndjson=True,
+            )
+    try:
+        print(f"Файл: {path} ({os.path.getsize(path) / 2**20:.1f} МБ)")
+        data, dict_bytes = measure("json (словари)", load_dicts, path)
+        compact, compact_bytes = measure("CompactKnowledgeTree", CompactKnowledgeTree.load, path)
+        if compact.to_dict() != data:
+            raise SystemExit("Колоночное дерево не совпадает с исходным JSON")
+        usage = compact.memory_usage()
+        print(f"Узлов: {usage['nodes']}, значений: {usage['values']}, уникальных строк: {usage['strings']}")
+        print(f"Байт на узел: {dict_bytes / usage['nodes']:.0f} -> {compact_bytes / usage['nodes']:.0f}, "
+              f"экономия x{dict_bytes / compact_bytes:.1f}")
+
+        compact.save_snapshot(snapshot_path)
+        print(f"Снимок: {os.path.getsize(snapshot_path) / 2**20:.1f} МБ")
+        mapped, _ = measure("снимок (mmap)", CompactKnowledgeTree.from_snapshot, snapshot_path)
+        if mapped.to_dict() != data:
+            raise SystemExit("Снимок не совпадает с исходным JSON")
+        mapped.close()
+    finally:
+        if not args.input:
+            os.remove(path)
+        os.remove(snapshot_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк горячих запросов к PostgreSQL: как было (SELECT * / RETURNING *,
+текст запроса на каждый вызов), с явным списком столбцов и с подготовленными
+запросами (queries.py: PREPARE один раз на соединение, затем EXECUTE).
+
+Для каждого запроса и режима — медиана времени вызова (execute + fetchall,
+режимы чередуются) и размер текста, который уходит на сервер. Перед замером проверяется, что все
+режимы возвращают одни и те же строки. Каждый запрос замеряется в своей
+транзакции, которая сразу откатывается: изменения не сохраняются, а блокировки
+строк не держатся дольше одного запроса из списка. Не запускайте бенчмарк
+одновременно с API на той же базе — миграции при старте API ждут эти блокировки.
+
+Пример (таблицу можно засеять через bench_api.py --rows 100000):
+    python bench_queries.py --calls 500
+"""
+import argparse
+import statistics
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db import DatabaseConfig, TimedConnection
+from queries import (
+    CATEGORY_STATISTICS,
+    DATABASE_ITEMS,
+    ITEM_COLUMNS,
+    ITEMS_BY_CATEGORY,
+    TOGGLE_ITEM,
+)
+from schema import HAS_MISSING_CATEGORIES
+
+
+def run_plain(query_text):
+    return lambda cursor, params: cursor.execute(query_text, params)
+
+
+def run_prepared(query):
+    return lambda cursor, params: query.execute(cursor, params)
+
+
+def modes(query):
+    return {
+        "SELECT *": run_plain(query.query.replace(ITEM_COLUMNS, "*")),
+        "столбцы": run_plain(query.query),
+        "PREPARE": run_prepared(query),
+    }
+
+
+def measure(cursor, runs, params, calls):
+    # Режимы чередуются по вызовам: дрейф нагрузки на машине достаётся всем поровну
+    timings = {mode: [] for mode in runs}
+    sent = dict.fromkeys(runs, 0)
+    for _ in range(calls):
+        for mode, run in runs.items():
+            started = time.perf_counter()
+            run(cursor, params)
+            cursor.fetchall()
+            timings[mode].append(time.perf_counter() - started)
+            sent[mode] += len(cursor.query)
+    return {mode: (statistics.median(timings[mode]), sent[mode] / calls) for mode in runs}
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--calls", type=int, default=500, help="Вызовов каждого запроса в каждом режиме")
+    p.add_argument("--page_size", type=int, default=100, help="LIMIT для страницы списка")
+    args = p.parse_args()
+
+    conn = psycopg2.connect(connection_factory=TimedConnection, **DatabaseConfig.from_env().connect_kwargs())
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                "SELECT created_at, id FROM fridge_items ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1",
+                (args.page_size,),
+            )
+            anchor = cursor.fetchone()
+            if anchor is None:
+                raise SystemExit(f"В fridge_items меньше {args.page_size + 1} строк — засейте таблицу (bench_api.py)")
+            # Самая маленькая категория: запрос и так отдаёт тысячи строк, замер идёт не часами
+            cursor.execute(
+                "SELECT category FROM fridge_items WHERE category IS NOT NULL "
+                "GROUP BY category ORDER BY COUNT(*), category LIMIT 1"
+            )
+            category = cursor.fetchone()["category"]
+
+            cases = [
+                ("Страница списка", DATABASE_ITEMS[(False, True)], (args.page_size,)),
+                ("Страница после курсора", DATABASE_ITEMS[(True, True)], (anchor["created_at"], anchor["id"], args.page_size)),
+                ("Товары категории", ITEMS_BY_CATEGORY, ([category],)),
+                ("Переключение товара", TOGGLE_ITEM, (anchor["id"],)),
+                ("Статистика", CATEGORY_STATISTICS, ()),
+                ("Проверка категорий", HAS_MISSING_CATEGORIES, ()),
+            ]
+
+            print(f"Вызовов на режим: {args.calls}; категория '{category}'")
+            print(f"{'запрос':<24} {'режим':<9} {'медиана, мкс':>13} {'текст, байт':>12}")
+            for title, query, params in cases:
+                runs = modes(query)
+                # Переключение чётное число раз оставляет строку как была; сравниваются строки после двух вызовов
+                results = []
+                for run in runs.values():
+                    run(cursor, params)
+                    run(cursor, params)
+                    results.append(cursor.fetchall())
+                if any(rows != results[0] for rows in results):
+                    raise SystemExit(f"{title}: режимы вернули разные строки")
+
+                baseline = None
+                for mode, (median, sent) in measure(cursor, runs, params, args.calls).items():
+                    baseline = baseline or median
+                    print(f"{title:<24} {mode:<9} {median * 1e6:13.1f} {sent:12.0f}  x{baseline / median:.2f}")
+                conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from product_tree import ProductTreeIndex
+
+DEFAULT_CATEGORY = "другое"
+
+# Уровни дерева товаров (itr2_DS.py) от корня к листу
+TREE_LEVELS = ("category", "subcategory", "product_group", "product")
+# Окончания, которые отбрасываются у первого слова названия узла: «Ноутбуки» -> «ноутбук»
+STEM_ENDINGS = "аеёиоуыьэюяй"
+MIN_STEM_LENGTH = 4
+# Всё, кроме букв и цифр, разделяет слова
+_WORD_SEPARATORS = re.compile(r"[\W_]+")
+
+# База знаний о категориях продуктов
+PRODUCT_CATEGORIES = {
+    "молочные": ["молоко", "сыр", "йогурт", "кефир", "творог", "сметана", "масло", "сливки"],
+    "овощи": ["помидор", "огурец", "картофель", "морковь", "лук", "капуста", "перец"],
+    "фрукты": ["яблоко", "банан", "апельсин", "лимон", "груша", "виноград"],
+    "мясо": ["колбаса", "сосиски", "курица", "говядина", "свинина", "ветчина"],
+    "напитки": ["сок", "вода", "чай", "кофе", "лимонад", "компот"],
+    "хлеб": ["хлеб", "батон", "булка", "лаваш", "сухари"],
+    "яйца": ["яйца", "яичница", "омлет"]
+}
+
+
+def categorize_naive(product_name: str, categories: Dict[str, List[str]], default: str = DEFAULT_CATEGORY) -> str:
+    """Исходный алгоритм: первая категория (в порядке словаря), ключевое слово которой входит в название"""
+    product_lower = product_name.lower()
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword in product_lower:
+                return category
+    return default
+
+
+class CategoryMatcher:
+    """
+    Автомат Ахо–Корасик по ключевым словам всех категорий.
+
+    Строится один раз из словаря {категория: [ключевые слова]} и за один проход
+    по символам названия находит все вхождения ключевых слов. Результат тот же,
+    что у categorize_naive: побеждает категория, стоящая в словаре раньше.
+    Переходы предрассчитаны для каждого состояния (полный ДКА), поэтому цена
+    категоризации не зависит от числа ключевых слов.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], default: str = DEFAULT_CATEGORY):
+        self.default = default
+        self.categories = list(categories)
+        self.keyword_count = 0
+
+        no_match = len(self.categories)
+        goto: List[Dict[str, int]] = [{}]
+        rank: List[int] = [no_match]
+
+        for category_rank, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                self.keyword_count += 1
+                state = 0
+                for char in keyword:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        goto.append({})
+                        rank.append(no_match)
+                        next_state = len(goto) - 1
+                        goto[state][char] = next_state
+                    state = next_state
+                rank[state] = min(rank[state], category_rank)
+
+        # Суффиксные ссылки и полные переходы строятся обходом в ширину
+        transitions: List[Dict[str, int]] = [{} for _ in goto]
+        transitions[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            rank[state] = min(rank[state], rank[fail[state]])
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            for char, next_state in goto[state].items():
+                fail[next_state] = transitions[fail[state]].get(char, 0)
+                queue.append(next_state)
+
+        self._transitions = transitions
+        self._rank = rank
+        self._no_match = no_match
+
+    @property
+    def state_count(self) -> int:
+        return len(self._transitions)
+
+    def match_rank(self, product_name: str) -> int:
+        """Номер лучшей совпавшей категории в порядке словаря; без совпадений — число категорий"""
+        transitions = self._transitions
+        rank = self._rank
+        best = self._no_match
+        state = 0
+        for char in product_name.lower():
+            state = transitions[state].get(char, 0)
+            if rank[state] < best:
+                best = rank[state]
+                if best == 0:
+                    break
+        return best
+
+    def category_for(self, rank: int) -> str:
+        return self.categories[rank] if rank < self._no_match else self.default
+
+    def levels_for(self, rank: int) -> Dict[str, Any]:
+        """Результат по уровням; у плоского словаря известен только верхний"""
+        return {**dict.fromkeys(TREE_LEVELS), "category": self.category_for(rank), "node_id": None}
+
+    def categorize(self, product_name: str) -> str:
+        return self.category_for(self.match_rank(product_name))
+
+    def categorize_many(self, product_names: Iterable[str]) -> List[str]:
+        categorize = self.categorize
+        return [categorize(name) for name in product_names]
+
+
+def keyword_stem(word: str) -> str:
+    """Грубая основа слова: без 1–2 гласных в конце, но не короче MIN_STEM_LENGTH"""
+    stem = word
+    for _ in range(2):
+        if len(stem) > MIN_STEM_LENGTH and stem[-1] in STEM_ENDINGS:
+            stem = stem[:-1]
+    return stem
+
+
+def word_text(text: str) -> str:
+    """
+    Текст для поиска с начала слова: нижний регистр, слова через один пробел
+    и пробел в начале. Ключевое слово в том же виде совпадает только с началом
+    слова: « блок» не найдётся в « яблоки»
+    """
+    return " " + _WORD_SEPARATORS.sub(" ", text.lower()).strip()
+
+
+def node_keywords(name: str) -> List[str]:
+    """Ключевые слова узла дерева: название целиком и основа первого слова"""
+    name = name.strip().lower()
+    if not name:
+        return []
+    stem = keyword_stem(name.split()[0])
+    return [name] if stem == name else [name, stem]
+
+
+class CategoryTree:
+    """
+    Словарь категоризации, построенный из дерева товаров.
+
+    Ключевые слова — названия узлов и основы их первых слов; совпадают они
+    только с начала слова в названии товара. Если слово есть у нескольких
+    узлов, оно относится к их ближайшему общему предку. Для каждого слова
+    заранее собран результат по уровням (category, subcategory, product_group,
+    product); в колонку category всегда попадает уровень level, а слова,
+    лежащие выше него, в словарь не входят.
+
+    fallback — плоский словарь {категория: [ключевые слова]} для товаров,
+    которых нет в дереве; его слова (и их основы) уступают словам дерева. Категория, чьи
+    ключевые слова дерево относит к одному узлу уровня level, хранится под
+    названием этого узла («молочные» -> «Молочные продукты»), остальные — как есть.
+    """
+
+    def __init__(
+        self,
+        tree: ProductTreeIndex,
+        level: str = "subcategory",
+        fallback: Optional[Dict[str, List[str]]] = None,
+    ):
+        if level not in TREE_LEVELS:
+            raise ValueError(f"Неизвестный уровень категорий: {level}; допустимы {TREE_LEVELS}")
+        self.level = level
+        owners: Dict[str, List[Dict[str, Any]]] = {}
+        # Слова, чей владелец уже сведён к общему предку нескольких узлов
+        shared = set()
+        for node in tree.iter_nodes():
+            path = tree.path_to_root(node["id"])[::-1]
+            for keyword in node_keywords(node["name"]):
+                current = owners.get(keyword)
+                if current is None:
+                    owners[keyword] = path
+                    continue
+                common = 0
+                while common < min(len(current), len(path)) and current[common]["id"] == path[common]["id"]:
+                    common += 1
+                # Узел и его потомок с тем же словом («Молоко» / «Молоко»): слово точнее называет потомка
+                if common == len(current) and keyword not in shared:
+                    owners[keyword] = path
+                elif common < len(path):
+                    owners[keyword] = current[:common]
+                    shared.add(keyword)
+
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.stored: Dict[str, str] = {}
+        # Категории перечисляются в порядке дерева, ключевые слова — в порядке появления
+        self.categories: Dict[str, List[str]] = {
+            node["name"]: [] for node in tree.iter_nodes() if node["type"] == level
+        }
+        for keyword, path in owners.items():
+            levels = dict.fromkeys(TREE_LEVELS)
+            for node in path:
+                if node["type"] in levels:
+                    levels[node["type"]] = node["name"]
+            # Слово, общее для разных ветвей выше level (или для разных корней),
+            # ничего не говорит о категории этого уровня
+            if not levels[level]:
+                continue
+            levels["node_id"] = path[-1]["id"]
+            self._add(word_text(keyword), levels, levels[level])
+
+        tree_results = dict(self.results)
+        self.fallback_keywords = set()
+        for category, keywords in (fallback or {}).items():
+            keywords = [word_text(variant) for keyword in keywords for variant in node_keywords(keyword)]
+            levels = self._alias(tree_results, keywords) or {**dict.fromkeys(TREE_LEVELS), level: category, "node_id": None}
+            for keyword in keywords:
+                if keyword.strip() and keyword not in self.results:
+                    self._add(keyword, levels, levels[level])
+                    self.fallback_keywords.add(keyword)
+
+    def _add(self, keyword: str, levels: Dict[str, Any], stored: str):
+        self.results[keyword] = levels
+        self.stored[keyword] = stored
+        self.categories.setdefault(stored, []).append(keyword.strip())
+
+    def _alias(self, tree_results: Dict[str, Dict[str, Any]], keywords: List[str]) -> Optional[Dict[str, Any]]:
+        """Уровни узла дерева, к которому относятся все узнанные деревом ключевые слова плоской категории"""
+        found: Dict[str, Dict[str, Any]] = {}
+        for keyword in keywords:
+            matches = [tree_keyword for tree_keyword in tree_results if tree_keyword in keyword]
+            if matches:
+                levels = tree_results[max(matches, key=len)]
+                found.setdefault(levels[self.level], levels)
+        if len(found) != 1:
+            return None
+        levels = next(iter(found.values()))
+        # Уровни ниже level для целой плоской категории неизвестны
+        deeper = TREE_LEVELS[TREE_LEVELS.index(self.level) + 1:]
+        return {**levels, **dict.fromkeys(deeper), "node_id": None}
+
+    @property
+    def version(self) -> str:
+        return dictionary_version({"level": self.level, "results": self.results})
+
+
+class TreeCategoryMatcher(CategoryMatcher):
+    """
+    Автомат по ключевым словам CategoryTree. Ранг слова — его место в списке:
+    сначала слова дерева, затем запасного словаря, внутри — по убыванию длины,
+    поэтому побеждает самое длинное совпадение: «масло сливочное» точнее, чем «масло».
+    Название перед поиском приводится к word_text, и слова совпадают с начала слова.
+    """
+
+    def __init__(self, tree_dictionary: CategoryTree, default: str = DEFAULT_CATEGORY):
+        fallback = tree_dictionary.fallback_keywords
+        keywords = sorted(tree_dictionary.results, key=lambda keyword: (keyword in fallback, -len(keyword)))
+        super().__init__({keyword: [keyword] for keyword in keywords}, default)
+        self.level = tree_dictionary.level
+        self._results = [tree_dictionary.results[keyword] for keyword in keywords]
+        self._stored = [tree_dictionary.stored[keyword] for keyword in keywords]
+
+    def match_rank(self, product_name: str) -> int:
+        return super().match_rank(word_text(product_name))
+
+    def category_for(self, rank: int) -> str:
+        return self._stored[rank] if rank < self._no_match else self.default
+
+    def levels_for(self, rank: int) -> Dict[str, Any]:
+        if rank < self._no_match:
+            return dict(self._results[rank])
+        return {**dict.fromkeys(TREE_LEVELS), "node_id": None}
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера со счётчиками попаданий"""
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"Размер кэша должен быть положительным: {maxsize}")
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def dictionary_version(categories: Dict[str, Any]) -> str:
+    """Отпечаток словаря категорий"""
+    payload = json.dumps(categories, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Categorizer:
+    """
+    Категоризация с мемоизацией по нормализованному названию.
+
+    Автомат, кэш и версия словаря хранятся одним неизменяемым снимком, который
+    reload() подменяет целиком: запросы, успевшие взять старый снимок, дописывают
+    результаты в старый кэш и не могут отравить новый.
+
+    Словарь — плоский {категория: [ключевые слова]} или CategoryTree из дерева
+    товаров; во втором случае classify() отдаёт результат по всем уровням.
+    Кэш хранит ранг совпадения, из которого автомат получает оба ответа.
+    """
+
+    def __init__(
+        self,
+        categories: Union[Dict[str, List[str]], CategoryTree],
+        cache_size: int = 10000,
+        default: str = DEFAULT_CATEGORY,
+    ):
+        self.default = default
+        self.cache_size = cache_size
+        self.reloads = 0
+        self._snapshot = self._build(categories)
+
+    def _build(
+        self, source: Union[Dict[str, List[str]], CategoryTree]
+    ) -> Tuple[Dict[str, List[str]], CategoryMatcher, LRUCache, str]:
+        if isinstance(source, CategoryTree):
+            return source.categories, TreeCategoryMatcher(source, self.default), LRUCache(self.cache_size), source.version
+        categories = {category: list(keywords) for category, keywords in source.items()}
+        return (
+            categories,
+            CategoryMatcher(categories, self.default),
+            LRUCache(self.cache_size),
+            dictionary_version(categories),
+        )
+
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        return self._snapshot[0]
+
+    @property
+    def version(self) -> str:
+        return self._snapshot[3]
+
+    def reload(self, categories: Union[Dict[str, List[str]], CategoryTree]) -> bool:
+        """Подменяет словарь; кэш сбрасывается. Возвращает False, если словарь не изменился"""
+        snapshot = self._build(categories)
+        if snapshot[3] == self.version:
+            return False
+        self._snapshot = snapshot
+        self.reloads += 1
+        return True
+
+    def _lookup(self, product_name: str) -> Tuple[CategoryMatcher, int]:
+        _, matcher, cache, _ = self._snapshot
+        key = product_name.strip().lower()
+        rank = cache.get(key)
+        if rank is None:
+            rank = matcher.match_rank(key)
+            cache.put(key, rank)
+        return matcher, rank
+
+    def categorize(self, product_name: str) -> str:
+        matcher, rank = self._lookup(product_name)
+        return matcher.category_for(rank)
+
+    def classify(self, product_name: str) -> Dict[str, Any]:
+        """Категория для колонки category и результат по уровням дерева"""
+        matcher, rank = self._lookup(product_name)
+        return {"category": matcher.category_for(rank), "levels": matcher.levels_for(rank)}
+
+    def categorize_many(self, product_names: Iterable[str]) -> List[str]:
+        categorize = self.categorize
+        return [categorize(name) for name in product_names]
+
+    def stats(self) -> Dict[str, Any]:
+        _, matcher, cache, version = self._snapshot
+        return {
+            **cache.stats(),
+            "reloads": self.reloads,
+            "dictionary_version": version,
+            "source": "product_tree" if isinstance(matcher, TreeCategoryMatcher) else "dictionary",
+            "level": getattr(matcher, "level", "category"),
+            "keywords": matcher.keyword_count,
+        }
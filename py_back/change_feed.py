@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+import psycopg2
+
+from db import DatabaseConfig
+
+# Канал NOTIFY, в который пишет триггер fridge_items_notify_change (schema.py)
+CHANNEL = "fridge_items_changes"
+# Клиент пропустил события (переполнение очереди, переподключение к БД) и должен перечитать список
+RESYNC_MESSAGE = json.dumps({"type": "resync"})
+RECONNECT_DELAY = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeedFull(Exception):
+    pass
+
+
+class Subscriber:
+    """
+    Очередь событий одного клиента. Очередь ограничена: если клиент не успевает
+    читать, новые события отбрасываются, а после разбора очереди он получает resync.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(queue_size)
+        self.lagging = False
+        self.dropped = 0
+
+    def offer(self, message: str):
+        if self.lagging:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagging = True
+            self.dropped += 1
+
+
+class ChangeFeed:
+    """
+    Лента изменений fridge_items для всех подписчиков процесса.
+
+    Одно выделенное соединение (не из пула) слушает LISTEN в цикле событий через
+    add_reader, без отдельного потока. Полезная нагрузка NOTIFY — уже готовый JSON,
+    он раздаётся подписчикам как есть, без сериализации на каждого клиента.
+    При потере соединения лента переподключается и рассылает resync.
+
+    on_change вызывается в пуле потоков один раз на пачку событий и после
+    переподключения — так процесс узнаёт и об изменениях, сделанных мимо него.
+    """
+
+    def __init__(
+        self,
+        config: DatabaseConfig,
+        queue_size: int = 100,
+        max_subscribers: int = 10000,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self.config = config
+        self.on_change = on_change
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.reconnects = 0
+        self.published = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            **self.config.connect_kwargs(),
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+        )
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            conn = None
+            try:
+                conn = await loop.run_in_executor(None, self._connect)
+                lost = loop.create_future()
+                loop.add_reader(conn.fileno(), self._on_readable, conn, lost)
+                self.connected = True
+                if self.reconnects:
+                    # Пока соединения не было, события могли потеряться
+                    self._broadcast(RESYNC_MESSAGE)
+                    self._changed(loop)
+                logger.info("Лента изменений слушает канал %s", CHANNEL)
+                error = await lost
+                logger.warning("Лента изменений потеряла соединение: %s", error)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Лента изменений не может подключиться к БД: %s", e)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    loop.remove_reader(conn.fileno())
+                    conn.close()
+            self.reconnects += 1
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def _on_readable(self, conn, lost: asyncio.Future):
+        try:
+            conn.poll()
+        except Exception as e:
+            if not lost.done():
+                lost.set_result(e)
+            return
+        notifies = list(conn.notifies)
+        conn.notifies.clear()
+        for notify in notifies:
+            self._broadcast(notify.payload)
+        if notifies:
+            self._changed(asyncio.get_running_loop())
+
+    def _changed(self, loop: asyncio.AbstractEventLoop):
+        if self.on_change is not None:
+            # Обработчик может ходить в сеть (Redis), цикл событий он не блокирует
+            loop.run_in_executor(None, self.on_change)
+
+    def _broadcast(self, message: str):
+        self.published += 1
+        for subscriber in self._subscribers:
+            subscriber.offer(message)
+
+    def subscribe(self) -> Subscriber:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise ChangeFeedFull(f"Подписчиков уже {len(self._subscribers)}")
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def messages(self, subscriber: Subscriber, heartbeat: float) -> AsyncIterator[Optional[str]]:
+        """События подписчика; None — пора отправить heartbeat, чтобы прокси не закрыл соединение"""
+        while True:
+            if subscriber.lagging and subscriber.queue.empty():
+                subscriber.lagging = False
+                yield RESYNC_MESSAGE
+                continue
+            try:
+                yield await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "channel": CHANNEL,
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "lagging": sum(1 for subscriber in self._subscribers if subscriber.lagging),
+            "dropped": sum(subscriber.dropped for subscriber in self._subscribers),
+            "published": self.published,
+            "reconnects": self.reconnects,
+        }
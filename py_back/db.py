@@ -0,0 +1,439 @@
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+
+from metrics import span
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за acquire_timeout секунд"""
+
+
+class TimedCursorMixin:
+    """Время execute и fetch* попадает в участки db_query и db_fetch текущего запроса (metrics.span)"""
+
+    def execute(self, query, vars=None):
+        with span("db_query"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with span("db_query"):
+            return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        with span("db_fetch"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with span("db_fetch"):
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+
+    def fetchall(self):
+        with span("db_fetch"):
+            return super().fetchall()
+
+
+@lru_cache(maxsize=None)
+def timed_cursor_class(cursor_class):
+    return type("Timed" + cursor_class.__name__, (TimedCursorMixin, cursor_class), {})
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Соединение пула: любой курсор, включая RealDictCursor и серверные, замеряется"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Имена запросов, уже подготовленных (PREPARE) в сессии этого соединения
+        self.prepared = set()
+
+    def cursor(self, *args, **kwargs):
+        cursor_class = kwargs.pop("cursor_factory", None) or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=timed_cursor_class(cursor_class), **kwargs)
+
+
+# DB_PREPARED_STATEMENTS=0 отключает PREPARE, например за pgbouncer в режиме транзакций,
+# где следующая транзакция может попасть в другую серверную сессию
+PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") != "0"
+
+
+class PreparedQuery:
+    """
+    Запрос из фиксированного набора горячих запросов. На каждом соединении он один раз
+    готовится через PREPARE, а дальше выполняется через EXECUTE: сервер не разбирает
+    и не планирует текст заново, а по сети уходят только имя и параметры.
+
+    Текст пишется с %s, как для cursor.execute; для PREPARE они заменяются на $1, $2, ...
+    Подготовленный запрос живёт до конца сессии и не откатывается вместе с транзакцией.
+    """
+
+    def __init__(self, name: str, query: str):
+        self.name = name
+        self.query = query
+        parts = query.split("%s")
+        self.param_count = len(parts) - 1
+        self.prepare_sql = f"PREPARE {name} AS " + "".join(
+            part + (f"${index}" if index <= self.param_count else "")
+            for index, part in enumerate(parts, start=1)
+        )
+        placeholders = ", ".join(["%s"] * self.param_count)
+        self.execute_sql = f"EXECUTE {name}" + (f" ({placeholders})" if placeholders else "")
+
+    def execute(self, cursor, params=()):
+        prepared = getattr(cursor.connection, "prepared", None)
+        if not PREPARED_STATEMENTS or prepared is None:
+            cursor.execute(self.query, params)
+            return
+        if self.name not in prepared:
+            # Имя запоминается только после успешного PREPARE: при ошибке соединение
+            # откатится при возврате в пул, а запрос подготовится при следующем вызове
+            cursor.execute(self.prepare_sql)
+            prepared.add(self.name)
+        cursor.execute(self.execute_sql, params)
+
+
+@dataclass(frozen=True)
+class DatabaseConfig:
+    """Параметры подключения и размеры пула (переопределяются через переменные окружения)"""
+
+    dbname: str = "fridge_db"
+    user: str = "fridge_user"
+    password: str = "1234"
+    host: str = "localhost"
+    port: str = "5432"
+    min_size: int = 1
+    max_size: int = 10
+    acquire_timeout: float = 5.0
+    health_check_interval: float = 30.0
+    connect_timeout: int = 5
+
+    @classmethod
+    def from_env(cls) -> "DatabaseConfig":
+        defaults = cls()
+        return cls(
+            dbname=os.getenv("DB_NAME", defaults.dbname),
+            user=os.getenv("DB_USER", defaults.user),
+            password=os.getenv("DB_PASSWORD", defaults.password),
+            host=os.getenv("DB_HOST", defaults.host),
+            port=os.getenv("DB_PORT", defaults.port),
+            min_size=int(os.getenv("DB_POOL_MIN", defaults.min_size)),
+            max_size=int(os.getenv("DB_POOL_MAX", defaults.max_size)),
+            acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", defaults.acquire_timeout)),
+            health_check_interval=float(os.getenv("DB_POOL_HEALTH_INTERVAL", defaults.health_check_interval)),
+            connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", defaults.connect_timeout)),
+        )
+
+    def connect_kwargs(self) -> Dict[str, str]:
+        return {
+            "dbname": self.dbname,
+            "user": self.user,
+            "password": self.password,
+            "host": self.host,
+            "port": self.port,
+            # Недоступная БД не подвешивает старт воркера дольше этого времени
+            "connect_timeout": str(self.connect_timeout),
+        }
+
+
+class DatabasePool:
+    """
+    Общий пул соединений psycopg2 для всех эндпоинтов.
+
+    ThreadedConnectionPool сам по себе не ждёт свободного соединения, а сразу
+    бросает PoolError, поэтому число одновременных владельцев ограничивается
+    семафором с таймаутом. Соединение, простоявшее дольше health_check_interval,
+    перед выдачей проверяется через SELECT 1 и при необходимости пересоздаётся.
+    """
+
+    def __init__(self, config: DatabaseConfig):
+        if config.min_size < 0 or config.max_size < max(1, config.min_size):
+            raise ValueError(f"Некорректные размеры пула: min={config.min_size}, max={config.max_size}")
+        self.config = config
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(config.max_size)
+        self._last_used: Dict[int, float] = {}
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def open(self):
+        if self._pool is None:
+            self._pool = pg_pool.ThreadedConnectionPool(
+                self.config.min_size,
+                self.config.max_size,
+                connection_factory=TimedConnection,
+                **self.config.connect_kwargs(),
+            )
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._last_used.clear()
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.config.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        if not self._is_healthy(conn):
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        return conn
+
+    def _checkin(self, conn, broken: bool):
+        if self._pool is None:
+            conn.close()
+            return
+        if broken or conn.closed:
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator["psycopg2.extensions.connection"]:
+        """Выдаёт соединение из пула; незакоммиченная транзакция откатывается при возврате"""
+        if self._pool is None:
+            raise RuntimeError("Пул соединений не открыт")
+        with span("db_acquire"):
+            acquired = self._slots.acquire(timeout=self.config.acquire_timeout)
+        if not acquired:
+            raise PoolTimeoutError(
+                f"Нет свободных соединений за {self.config.acquire_timeout} с "
+                f"(max_size={self.config.max_size})"
+            )
+        with self._lock:
+            self._in_use += 1
+        conn = None
+        broken = False
+        try:
+            with span("db_acquire"):
+                conn = self._checkout()
+            yield conn
+        finally:
+            if conn is not None:
+                try:
+                    if not conn.closed:
+                        conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+                self._checkin(conn, broken)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "min_size": self.config.min_size,
+            "max_size": self.config.max_size,
+            "in_use": self._in_use,
+            "acquire_timeout": self.config.acquire_timeout,
+        }
+
+
+# Отставание реплики в секундах относительно позиции WAL primary (параметр запроса).
+# Реплика, применившая WAL до этой позиции, не отстаёт, даже если primary простаивает
+# и pg_last_xact_replay_timestamp давно не менялся. Иначе отставание — время с последней
+# применённой транзакции: у реплики, потерявшей поток WAL, оно растёт, пока её не выведут
+# из ротации. NULL — реплика позади primary, но ещё ничего не применила
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+# Позиция WAL primary: всё, что закоммичено к этому моменту, лежит до неё
+PRIMARY_LSN_QUERY = "SELECT pg_current_wal_lsn()"
+# Применила ли реплика WAL до заданной позиции (NULL у сервера не в режиме восстановления)
+REPLICA_REPLAYED_QUERY = "SELECT COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, false)"
+
+
+class Replica:
+    """Пул реплики и результат последней проверки отставания"""
+
+    def __init__(self, pool: DatabasePool):
+        self.pool = pool
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.pool.config.host}:{self.pool.config.port}"
+
+    def usable(self, max_lag: float) -> bool:
+        return self.pool.is_open and self.lag is not None and self.lag <= max_lag
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтений: запросы только на чтение расходятся по репликам по кругу,
+    запись и всё остальное идёт в primary (db_pool).
+
+    Отставание реплик проверяет check_replicas() (фоновая задача в main.py);
+    реплика с ошибкой или с отставанием больше max_lag из ротации выпадает, а если
+    подходящих нет — чтение уходит в primary.
+
+    Чтение с fresh=True должно видеть всё, что закоммичено в primary к его началу
+    (кем угодно: любым воркером, Node-бэкендом, psql). Для него сначала берётся
+    позиция WAL primary, и реплика используется, только если уже применила WAL
+    до неё; иначе чтение идёт в primary. Так читаются ответы, которые кладутся
+    в кэш, и запросы клиента сразу после его записи.
+    """
+
+    def __init__(self, primary: DatabasePool, replicas: List[DatabasePool], max_lag: float = 5.0):
+        self.primary = primary
+        self.replicas = [Replica(pool) for pool in replicas]
+        self.max_lag = max_lag
+        self._next = 0
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+        self.fallbacks = 0
+        self.behind = 0
+
+    @classmethod
+    def from_env(cls, primary: DatabasePool) -> "ReplicaRouter":
+        """DB_REPLICAS — host[:port] через запятую, остальные параметры подключения как у primary"""
+        replicas = []
+        for spec in filter(None, (part.strip() for part in os.getenv("DB_REPLICAS", "").split(","))):
+            host, _, port = spec.partition(":")
+            replicas.append(DatabasePool(replace(primary.config, host=host, port=port or primary.config.port)))
+        return cls(primary, replicas, float(os.getenv("DB_REPLICA_MAX_LAG", 5)))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def check_replicas(self):
+        """
+        Открывает недоступные раньше пулы и обновляет отставание; блокирующий вызов.
+        Отставание считается от позиции WAL primary: если её не узнать, проверить
+        реплики не с чем, и они выводятся из ротации до следующей проверки
+        """
+        try:
+            lsn = self._primary_lsn()
+        except (psycopg2.Error, PoolTimeoutError) as e:
+            for replica in self.replicas:
+                self._mark_down(replica, f"primary недоступен: {str(e).strip()}")
+            return
+        for replica in self.replicas:
+            try:
+                replica.pool.open()
+                with replica.pool.connection() as conn, conn.cursor() as cursor:
+                    cursor.execute(REPLICA_LAG_QUERY, (lsn,))
+                    lag = cursor.fetchone()[0]
+            except (psycopg2.Error, PoolTimeoutError) as e:
+                self._mark_down(replica, e)
+                continue
+            if lag is None:
+                self._mark_down(replica, f"реплика не применила WAL до {lsn}")
+            else:
+                replica.lag = float(lag)
+                replica.error = None
+
+    def _mark_down(self, replica: Replica, error: Union[Exception, str]):
+        replica.lag = None
+        replica.error = str(error).strip()
+
+    def _pick(self) -> Optional[Replica]:
+        candidates = [replica for replica in self.replicas if replica.usable(self.max_lag)]
+        if not candidates:
+            return None
+        with self._lock:
+            self._next += 1
+            return candidates[self._next % len(candidates)]
+
+    def _primary_lsn(self) -> str:
+        with self.primary.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(PRIMARY_LSN_QUERY)
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _replayed(conn, lsn: str) -> bool:
+        with conn.cursor() as cursor:
+            cursor.execute(REPLICA_REPLAYED_QUERY, (lsn,))
+            return cursor.fetchone()[0]
+
+    @contextmanager
+    def read_connection(self, fresh: bool = False) -> Iterator["psycopg2.extensions.connection"]:
+        """
+        Соединение для запросов только на чтение: реплика, а если подходящей нет — primary.
+        fresh=True — реплика подходит, только если видит все коммиты primary на момент вызова
+        """
+        replica = self._pick()
+        if replica is not None:
+            required_lsn = self._primary_lsn() if fresh else None
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(replica.pool.connection())
+                caught_up = required_lsn is None or self._replayed(conn, required_lsn)
+            except (psycopg2.Error, PoolTimeoutError) as e:
+                stack.close()
+                # Реплика упала между проверками: выводим из ротации до следующей проверки
+                self._mark_down(replica, e)
+                self.fallbacks += 1
+            else:
+                if caught_up:
+                    replica.reads += 1
+                    with stack:
+                        yield conn
+                    return
+                stack.close()
+                self.behind += 1
+        self.primary_reads += 1
+        with self.primary.connection() as conn:
+            yield conn
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_lag": self.max_lag,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "behind": self.behind,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "lag": replica.lag,
+                    "in_rotation": replica.usable(self.max_lag),
+                    "reads": replica.reads,
+                    "error": replica.error,
+                    "pool": replica.pool.stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+# Пул создаётся и открывается в lifespan приложения (см. main.py)
+db_pool = DatabasePool(DatabaseConfig.from_env())
+# Реплики для чтения (DB_REPLICAS); без них read_connection() — то же, что db_pool.connection()
+db_replicas = ReplicaRouter.from_env(db_pool)
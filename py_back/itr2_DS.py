@@ -1,6 +1,8 @@
 import json
 from typing import List, Dict, Any
 
+from product_tree import load_product_tree, snapshot_path_for
+
 class ProductTreeGenerator:
     """Генератор дерева товаров с четкой структурой"""
     
@@ -169,12 +171,23 @@ class ProductTreeGenerator:
         print(f"Дерево сохранено в файл: {filename}")
         print(f"Количество корневых категорий: {len(tree)}")
 
+    def save_snapshot(self, json_filename: str = "product_tree.json"):
+        """
+        Сохраняет бинарный снимок рядом с JSON: API отображает его в память без разбора.
+        Снимок собирается из JSON и помнит его sha1, поэтому при правке JSON он пересобирается
+        """
+        filename = snapshot_path_for(json_filename)
+        index = load_product_tree(json_filename, filename)
+        print(f"Снимок дерева сохранен в файл: {filename} ({len(index)} узлов)")
+        index.close()
+
 def main():
     """Основная функция"""
     print("Генерация дерева товаров...")
     
     generator = ProductTreeGenerator()
     generator.save_to_json("product_tree_samara.json")
+    generator.save_snapshot("product_tree_samara.json")
     
     print("Готово!")
 
@@ -2,11 +2,346 @@
 # then runs it once to produce a sample file you can download.
 
 
-import json, random, argparse, sys, textwrap, os
+import json, random, argparse, sys, textwrap, os, itertools, hashlib
+import multiprocessing
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator, Optional, TextIO
 
-def generate_knowledge_tree(
+try:
+    import numpy as np
+except ImportError:  # NumPy нужен только для векторного генератора (backend="numpy")
+    np = None
+
+TREE_VERSION = "1.0"
+TREE_DESCRIPTION = "Дерево знаний: Класс -> Тип -> Спецификация -> Подробная спецификация"
+
+# Библиотеки доменов
+CLASS_POOL = [
+    "Товары для учёбы",
+    "Стройка и ремонт",
+    "Кухня и посуда",
+    "Электроника",
+    "Спорт и отдых",
+    "Одежда и обувь",
+    "Красота и здоровье",
+    "Автотовары",
+    "Зоотовары",
+    "Товары для дома",
+    "Сад и огород",
+    "Игрушки и хобби",
+    "Офис и канцелярия",
+    "Бытовая техника",
+    "Музыка и инструменты",
+    "Фото и видео",
+    "Компьютеры и сети",
+    "Книги и журналы",
+    "Продукты питания",
+    "Напитки",
+    "Умный дом",
+    "Туризм и путешествия",
+    "Ювелирные изделия",
+    "Часы и аксессуары",
+    "Детские товары",
+    "Подарки и сувениры",
+    "Здоровое питание",
+    "Мебель",
+    "Инструменты",
+    "Безопасность и охрана",
+    "Мото/Вело",
+    "Домашний текстиль",
+    "Строительные материалы",
+    "Освещение",
+    "Рыбалка и охота",
+    "Товары для праздника",
+    "Медицинские изделия",
+    "Программное обеспечение",
+    "Аудио и Hi-Fi",
+    "Автозапчасти",
+    "Кондитерка",
+    "Косметика",
+    "Парфюмерия",
+    "Гигиена",
+    "Табачные принадлежности",
+    "Зоокорма",
+    "Кормление и уход",
+    "Сувениры",
+    "Рукоделие",
+    "Декор",
+    "Посуда",
+    "Кухонная техника",
+    "Гаджеты",
+    "Игровые приставки",
+    "Настольные игры",
+    "Смартфоны и планшеты",
+    "Ноутбуки и ПК",
+]
+
+# Типы по доменам (миксы + общая корзина)
+GENERIC_TYPES = [
+    "Тетради", "Ручки", "Карандаши", "Линейки", "Фломастеры",
+    "Блокноты", "Маркер", "Папки", "Степлеры", "Скотч",
+    "Пила", "Дрель", "Молоток", "Отвёртки", "Шурупы",
+    "Сковороды", "Кастрюли", "Ножи", "Кружки", "Тарелки",
+    "Сыр", "Колбаса", "Хлеб", "Молоко", "Кофе",
+    "Смартфоны", "Ноутбуки", "Наушники", "Колонки", "Телевизоры",
+    "Кроссовки", "Куртки", "Футболки", "Джинсы", "Кепки",
+    "Гантели", "Скакалки", "Коврики для йоги", "Мячи", "Ракетки",
+    "Косметика", "Парфюм", "Шампунь", "Зубная паста", "Мыло",
+    "Кабели", "Зарядные устройства", "Память", "Флешки", "Роутеры",
+    "Игрушки", "Настольные игры", "Пазлы", "Конструкторы", "Куклы",
+    "Фотоаппараты", "Объективы", "Штативы", "Фильтры", "Дроны",
+    "Холодильники", "Пылесосы", "Стиральные машины", "Плиты", "Микроволновки"
+]
+
+SPEC_POOL = [
+    "Размеры", "Вес", "Цвет", "Материал", "Бренд", "Модель",
+    "Страна производства", "Гарантия", "Срок годности", "Энергопотребление",
+    "Совместимость", "Интерфейсы", "Ёмкость", "Мощность", "Длина кабеля",
+    "Тип упаковки", "Температурный режим", "Класс защиты", "Класс точности",
+    "Количество в наборе", "Жёсткость", "Плотность", "Толщина", "Объём",
+    "Разрешение", "Диагональ", "Частота", "Скорость", "Прочность"
+]
+
+# детальные спецификации по "семействам" характеристик.
+# Поле описывается кортежем (вид, параметры...):
+#   ("uniform", lo, hi, знаков)   — round(uniform(lo, hi), знаков)
+#   ("choice", варианты)          — один из вариантов
+#   ("int", lo, hi)               — целое lo..hi включительно
+#   ("ints", lo, hi, n)           — список из n таких целых
+#   ("sample", варианты, kmin, kmax) — kmin..kmax разных вариантов
+#   ("const", значение)
+#   ("format", шаблон, [поля])    — шаблон.format(*значения полей)
+# Одна таблица обслуживает и скалярный генератор, и векторный (NumPy).
+DETAIL_FIELDS = {
+    "Размеры": [
+        ("длина", ("uniform", 1, 300, 2)),
+        ("ширина", ("uniform", 1, 300, 2)),
+        ("высота", ("uniform", 1, 300, 2)),
+        ("единица", ("choice", ["мм", "см", "м"])),
+    ],
+    "Вес": [
+        ("значение", ("uniform", 0.01, 100, 3)),
+        ("единица", ("choice", ["г", "кг"])),
+    ],
+    "Цвет": [
+        ("основной", ("choice", ["чёрный","белый","серый","красный","синий","зелёный","жёлтый","оранжевый","фиолетовый","коричневый"])),
+        ("rgb", ("ints", 0, 255, 3)),
+    ],
+    "Материал": [
+        ("основной", ("choice", ["пластик","сталь","алюминий","дерево","бумага","стекло","керамика","каучук","хлопок","полиэстер"])),
+        ("покрытие", ("choice", ["нет","лакировка","анодирование","порошковая окраска"])),
+    ],
+    "Бренд": [("название", ("choice", ["Acme","Orion","Helios","Nord","Vega","Aurum","Delta","Zenith","Galaxy","Nova"]))],
+    "Модель": [("код", ("format", "M{}-{}{}", [("int", 100, 999), ("choice", "ABCDEFG"), ("int", 1, 9)]))],
+    "Страна производства": [("страна", ("choice", ["Китай","Россия","Германия","Польша","Италия","Вьетнам","Турция","Индия","Франция","США"]))],
+    "Гарантия": [("месяцев", ("choice", [6,12,24,36]))],
+    "Срок годности": [("месяцев", ("choice", [3,6,12,18,24,36]))],
+    "Энергопотребление": [("кВт⋅ч", ("uniform", 0.1, 3.5, 2)), ("класс", ("choice", ["A","A+","A++","B"]))],
+    "Совместимость": [("поддержка", ("sample", ["Windows","macOS","Linux","Android","iOS","HarmonyOS"], 1, 4))],
+    "Интерфейсы": [("порты", ("sample", ["USB-A","USB-C","HDMI","DisplayPort","3.5мм","RJ-45","Wi-Fi","Bluetooth","NFC"], 1, 5))],
+    "Ёмкость": [("значение", ("choice", [8,16,32,64,128,256,512,1024])), ("единица", ("choice", ["ГБ","мА⋅ч","л"]))],
+    "Мощность": [("ватт", ("choice", [5,10,18,20,45,65,90,120,500,1000]))],
+    "Длина кабеля": [("метры", ("uniform", 0.1, 10.0, 2))],
+    "Тип упаковки": [("вид", ("choice", ["коробка","блистер","пакет","бобина","рулон","паллет"]))],
+    "Температурный режим": [("мин", ("int", -40, 0)), ("макс", ("int", 30, 120)), ("единица", ("const", "°C"))],
+    "Класс защиты": [("IP", ("format", "IP{}", [("int", 20, 69)]))],
+    "Класс точности": [("класс", ("choice", ["A","B","C","D"]))],
+    "Количество в наборе": [("шт", ("int", 1, 50))],
+    "Жёсткость": [("шкала", ("choice", ["HB","H","2H","B","2B","F"]))],
+    "Плотность": [("значение", ("int", 60, 300)), ("единица", ("const", "г/м²"))],
+    "Толщина": [("значение", ("uniform", 0.05, 50.0, 2)), ("единица", ("const", "мм"))],
+    "Объём": [("значение", ("uniform", 0.1, 100.0, 2)), ("единица", ("choice", ["л","мл","м³"]))],
+    "Разрешение": [("px", ("format", "{}×{}", [("choice", [1280,1920,2560,3840]), ("choice", [720,1080,1440,2160])]))],
+    "Диагональ": [("дюймы", ("uniform", 4.7, 85.0, 1))],
+    "Частота": [("Гц", ("choice", [50,60,120,144,240,360]))],
+    "Скорость": [("единица", ("choice", ["Мбит/с","страниц/мин","об/мин"])), ("значение", ("uniform", 1, 5000, 2))],
+    "Прочность": [("класс", ("choice", ["низкая","средняя","высокая"])), ("метод", ("choice", ["Шор","Роквелл","Виккерс"]))],
+}
+
+
+def draw_field(rng, field):
+    """Одно значение поля; порядок обращений к rng совпадает с исходными лямбда-шаблонами"""
+    kind = field[0]
+    if kind == "uniform":
+        return round(rng.uniform(field[1], field[2]), field[3])
+    if kind == "choice":
+        return rng.choice(field[1])
+    if kind == "int":
+        return rng.randint(field[1], field[2])
+    if kind == "ints":
+        return [rng.randint(field[1], field[2]) for _ in range(field[3])]
+    if kind == "sample":
+        return rng.sample(field[1], k=rng.randint(field[2], field[3]))
+    if kind == "const":
+        return field[1]
+    if kind == "format":
+        return field[1].format(*(draw_field(rng, part) for part in field[2]))
+    raise ValueError(f"Неизвестный вид поля: {kind}")
+
+
+def build_detail_templates(rng) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """Шаблоны подробных спецификаций; rng — random.Random или сам модуль random"""
+    return {
+        spec_name: (lambda fields=fields: {name: draw_field(rng, field) for name, field in fields})
+        for spec_name, fields in DETAIL_FIELDS.items()
+    }
+
+
+def make_details_for_spec(
+    rng,
+    detail_templates: Dict[str, Callable[[], Dict[str, Any]]],
+    spec_name: str,
+    details_per_spec_min: int,
+    details_per_spec_max: int,
+) -> Dict[str, Any]:
+    # Возвращаем 1–N детальных полей по шаблону, либо generic словарь
+    n = rng.randint(details_per_spec_min, details_per_spec_max)
+    if spec_name in detail_templates:
+        # генерим один «шаблонный» объект и миксуем с произвольными ключами
+        base = detail_templates[spec_name]()
+        # добавим произвольные поля
+        for i in range(max(0, n - len(base))):
+            base[f"доп_{i+1}"] = rng.choice([True, False, round(rng.uniform(0.1, 999.9), 2), rng.randint(1,999)])
+        return base
+    else:
+        return {f"поле_{i+1}": rng.choice([True, False, round(rng.uniform(0.1, 999.9), 2), rng.randint(1,999)]) for i in range(n)}
+
+
+# --- Векторный генератор подробных спецификаций (NumPy) ---
+
+def _draw_field_batch(gen, field, size: int) -> List[Any]:
+    """size значений поля одним векторным вызовом; результат — обычные значения Python"""
+    kind = field[0]
+    if kind == "uniform":
+        return np.round(gen.uniform(field[1], field[2], size), field[3]).tolist()
+    if kind == "choice":
+        options = np.array(list(field[1]), dtype=object)
+        return options[gen.integers(0, len(options), size)].tolist()
+    if kind == "int":
+        return gen.integers(field[1], field[2] + 1, size).tolist()
+    if kind == "ints":
+        return gen.integers(field[1], field[2] + 1, (size, field[3])).tolist()
+    if kind == "sample":
+        options = field[1]
+        counts = gen.integers(field[2], field[3] + 1, size).tolist()
+        orders = np.argsort(gen.random((size, len(options))), axis=1).tolist()
+        return [[options[i] for i in order[:k]] for order, k in zip(orders, counts)]
+    if kind == "const":
+        return [field[1]] * size
+    if kind == "format":
+        parts = [_draw_field_batch(gen, part, size) for part in field[2]]
+        return [field[1].format(*values) for values in zip(*parts)]
+    raise ValueError(f"Неизвестный вид поля: {kind}")
+
+
+def _draw_extra_values(gen, size: int, width: int) -> List[List[Any]]:
+    """Матрица size x width случайных значений из [True, False, float, int], как у доп_/поле_"""
+    if width <= 0:
+        return [[] for _ in range(size)]
+    kinds = gen.integers(0, 4, (size, width)).tolist()
+    floats = np.round(gen.uniform(0.1, 999.9, (size, width)), 2).tolist()
+    ints = gen.integers(1, 1000, (size, width)).tolist()
+    return [
+        [(True, False, f, i)[k] for k, f, i in zip(kind_row, float_row, int_row)]
+        for kind_row, float_row, int_row in zip(kinds, floats, ints)
+    ]
+
+
+def make_details_batch_numpy(
+    gen,
+    spec_names: List[str],
+    details_per_spec_min: int,
+    details_per_spec_max: int,
+) -> List[Dict[str, Any]]:
+    """
+    Подробные спецификации для пачки спецификаций.
+
+    Спецификации группируются по виду, и все значения каждого поля группы
+    тянутся одним вызовом numpy.random.Generator. Контракт воспроизводимости
+    свой: результат определяется состоянием gen и списком spec_names
+    (со скалярным генератором значения не совпадают, распределения — те же).
+    """
+    if np is None:
+        raise RuntimeError("Для векторного генератора нужен NumPy: pip install numpy")
+
+    n_fields = gen.integers(details_per_spec_min, details_per_spec_max + 1, len(spec_names)).tolist()
+    groups: Dict[str, List[int]] = {}
+    for position, spec_name in enumerate(spec_names):
+        groups.setdefault(spec_name, []).append(position)
+
+    results: List[Dict[str, Any]] = [{} for _ in spec_names]
+    # Порядок групп фиксирован (по первому появлению), чтобы поток случайных чисел был воспроизводим
+    for spec_name, positions in groups.items():
+        size = len(positions)
+        fields = DETAIL_FIELDS.get(spec_name)
+        if fields is not None:
+            columns = [(name, _draw_field_batch(gen, field, size)) for name, field in fields]
+            extra_prefix, base_count = "доп_", len(fields)
+        else:
+            columns = []
+            extra_prefix, base_count = "поле_", 0
+        extras = _draw_extra_values(gen, size, details_per_spec_max - base_count)
+
+        for row, position in enumerate(positions):
+            details = results[position]
+            for name, values in columns:
+                details[name] = values[row]
+            for i in range(max(0, n_fields[position] - base_count)):
+                details[f"{extra_prefix}{i+1}"] = extras[row][i]
+    return results
+
+
+def make_class(
+    rng,
+    make_details: Callable[[str], Dict[str, Any]],
+    class_id: int,
+    name: str,
+    type_ids: Iterator[int],
+    spec_ids: Iterator[int],
+    detail_ids: Iterator[int],
+    types_per_class_min: int,
+    types_per_class_max: int,
+    specs_per_type_min: int,
+    specs_per_type_max: int,
+) -> Dict[str, Any]:
+    """
+    Собирает один класс: типы, спецификации и подробные спецификации.
+    id берутся из итераторов, значения подробной спецификации — из make_details(имя).
+    """
+    num_types = rng.randint(types_per_class_min, types_per_class_max)
+    types = []
+    for _ in range(num_types):
+        tname = rng.choice(GENERIC_TYPES)
+        type_entry = {
+            "id": next(type_ids),
+            "тип_товара": tname,
+            "спецификации": []
+        }
+
+        num_specs = rng.randint(specs_per_type_min, specs_per_type_max)
+        chosen_specs = rng.sample(SPEC_POOL, k=min(num_specs, len(SPEC_POOL)))
+        for sname in chosen_specs:
+            spec_entry = {
+                "id": next(spec_ids),
+                "спецификация": sname,
+                "подробная_спецификация": {
+                    "id": next(detail_ids),
+                    "значения": make_details(sname)
+                }
+            }
+            type_entry["спецификации"].append(spec_entry)
+
+        types.append(type_entry)
+
+    return {
+        "id": class_id,
+        "класс_товара": name,
+        "типы": types
+    }
+
+
+def iter_knowledge_tree_classes(
     num_classes: int = 30,
     types_per_class_min: int = 8,
     types_per_class_max: int = 18,
@@ -15,172 +350,26 @@ def generate_knowledge_tree(
     details_per_spec_min: int = 2,
     details_per_spec_max: int = 6,
     seed: int = 42,
-) -> Dict[str, Any]:
+) -> Iterator[Dict[str, Any]]:
     """
-    Генерирует дерево знаний:
+    Генератор классов дерева знаний по одному:
     Класс товара -> Тип товара -> Спецификация -> Подробная спецификация
 
     ВСЕ верхние id (классы) будут > 100.
+    В памяти держится только текущий класс; последовательность случайных
+    чисел та же, что у generate_knowledge_tree.
     """
     random.seed(seed)
-
-    # Библиотеки доменов
-    class_pool = [
-        "Товары для учёбы",
-        "Стройка и ремонт",
-        "Кухня и посуда",
-        "Электроника",
-        "Спорт и отдых",
-        "Одежда и обувь",
-        "Красота и здоровье",
-        "Автотовары",
-        "Зоотовары",
-        "Товары для дома",
-        "Сад и огород",
-        "Игрушки и хобби",
-        "Офис и канцелярия",
-        "Бытовая техника",
-        "Музыка и инструменты",
-        "Фото и видео",
-        "Компьютеры и сети",
-        "Книги и журналы",
-        "Продукты питания",
-        "Напитки",
-        "Умный дом",
-        "Туризм и путешествия",
-        "Ювелирные изделия",
-        "Часы и аксессуары",
-        "Детские товары",
-        "Подарки и сувениры",
-        "Здоровое питание",
-        "Мебель",
-        "Инструменты",
-        "Безопасность и охрана",
-        "Мото/Вело",
-        "Домашний текстиль",
-        "Строительные материалы",
-        "Освещение",
-        "Рыбалка и охота",
-        "Товары для праздника",
-        "Медицинские изделия",
-        "Программное обеспечение",
-        "Аудио и Hi-Fi",
-        "Автозапчасти",
-        "Кондитерка",
-        "Косметика",
-        "Парфюмерия",
-        "Гигиена",
-        "Табачные принадлежности",
-        "Зоокорма",
-        "Кормление и уход",
-        "Сувениры",
-        "Рукоделие",
-        "Декор",
-        "Посуда",
-        "Кухонная техника",
-        "Гаджеты",
-        "Игровые приставки",
-        "Настольные игры",
-        "Смартфоны и планшеты",
-        "Ноутбуки и ПК",
-    ]
-
-    # Типы по доменам (миксы + общая корзина)
-    generic_types = [
-        "Тетради", "Ручки", "Карандаши", "Линейки", "Фломастеры",
-        "Блокноты", "Маркер", "Папки", "Степлеры", "Скотч",
-        "Пила", "Дрель", "Молоток", "Отвёртки", "Шурупы",
-        "Сковороды", "Кастрюли", "Ножи", "Кружки", "Тарелки",
-        "Сыр", "Колбаса", "Хлеб", "Молоко", "Кофе",
-        "Смартфоны", "Ноутбуки", "Наушники", "Колонки", "Телевизоры",
-        "Кроссовки", "Куртки", "Футболки", "Джинсы", "Кепки",
-        "Гантели", "Скакалки", "Коврики для йоги", "Мячи", "Ракетки",
-        "Косметика", "Парфюм", "Шампунь", "Зубная паста", "Мыло",
-        "Кабели", "Зарядные устройства", "Память", "Флешки", "Роутеры",
-        "Игрушки", "Настольные игры", "Пазлы", "Конструкторы", "Куклы",
-        "Фотоаппараты", "Объективы", "Штативы", "Фильтры", "Дроны",
-        "Холодильники", "Пылесосы", "Стиральные машины", "Плиты", "Микроволновки"
-    ]
-
-    spec_pool = [
-        "Размеры", "Вес", "Цвет", "Материал", "Бренд", "Модель",
-        "Страна производства", "Гарантия", "Срок годности", "Энергопотребление",
-        "Совместимость", "Интерфейсы", "Ёмкость", "Мощность", "Длина кабеля",
-        "Тип упаковки", "Температурный режим", "Класс защиты", "Класс точности",
-        "Количество в наборе", "Жёсткость", "Плотность", "Толщина", "Объём",
-        "Разрешение", "Диагональ", "Частота", "Скорость", "Прочность"
-    ]
-
-    # детальные спецификации по "семействам" характеристик
-    detail_templates = {
-        "Размеры": lambda: {
-            "длина": round(random.uniform(1, 300), 2),
-            "ширина": round(random.uniform(1, 300), 2),
-            "высота": round(random.uniform(1, 300), 2),
-            "единица": random.choice(["мм", "см", "м"]),
-        },
-        "Вес": lambda: {
-            "значение": round(random.uniform(0.01, 100), 3),
-            "единица": random.choice(["г", "кг"]),
-        },
-        "Цвет": lambda: {
-            "основной": random.choice(
-                ["чёрный","белый","серый","красный","синий","зелёный","жёлтый","оранжевый","фиолетовый","коричневый"]
-            ),
-            "rgb": [random.randint(0,255) for _ in range(3)],
-        },
-        "Материал": lambda: {
-            "основной": random.choice(["пластик","сталь","алюминий","дерево","бумага","стекло","керамика","каучук","хлопок","полиэстер"]),
-            "покрытие": random.choice(["нет","лакировка","анодирование","порошковая окраска"])
-        },
-        "Бренд": lambda: {"название": random.choice(["Acme","Orion","Helios","Nord","Vega","Aurum","Delta","Zenith","Galaxy","Nova"]) },
-        "Модель": lambda: {"код": f"M{random.randint(100,999)}-{random.choice('ABCDEFG')}{random.randint(1,9)}" },
-        "Страна производства": lambda: {"страна": random.choice(["Китай","Россия","Германия","Польша","Италия","Вьетнам","Турция","Индия","Франция","США"]) },
-        "Гарантия": lambda: {"месяцев": random.choice([6,12,24,36]) },
-        "Срок годности": lambda: {"месяцев": random.choice([3,6,12,18,24,36]) },
-        "Энергопотребление": lambda: {"кВт⋅ч": round(random.uniform(0.1, 3.5), 2), "класс": random.choice(["A","A+","A++","B"]) },
-        "Совместимость": lambda: {"поддержка": random.sample(["Windows","macOS","Linux","Android","iOS","HarmonyOS"], k=random.randint(1,4))},
-        "Интерфейсы": lambda: {"порты": random.sample(["USB-A","USB-C","HDMI","DisplayPort","3.5мм","RJ-45","Wi-Fi","Bluetooth","NFC"], k=random.randint(1,5))},
-        "Ёмкость": lambda: {"значение": random.choice([8,16,32,64,128,256,512,1024]), "единица": random.choice(["ГБ","мА⋅ч","л"]) },
-        "Мощность": lambda: {"ватт": random.choice([5,10,18,20,45,65,90,120,500,1000]) },
-        "Длина кабеля": lambda: {"метры": round(random.uniform(0.1, 10.0), 2) },
-        "Тип упаковки": lambda: {"вид": random.choice(["коробка","блистер","пакет","бобина","рулон","паллет"]) },
-        "Температурный режим": lambda: {"мин": random.randint(-40, 0), "макс": random.randint(30, 120), "единица": "°C" },
-        "Класс защиты": lambda: {"IP": f"IP{random.randint(20,69)}" },
-        "Класс точности": lambda: {"класс": random.choice(["A","B","C","D"]) },
-        "Количество в наборе": lambda: {"шт": random.randint(1, 50) },
-        "Жёсткость": lambda: {"шкала": random.choice(["HB","H","2H","B","2B","F"]) },
-        "Плотность": lambda: {"значение": random.randint(60, 300), "единица": "г/м²" },
-        "Толщина": lambda: {"значение": round(random.uniform(0.05, 50.0), 2), "единица": "мм" },
-        "Объём": lambda: {"значение": round(random.uniform(0.1, 100.0), 2), "единица": random.choice(["л","мл","м³"]) },
-        "Разрешение": lambda: {"px": f"{random.choice([1280,1920,2560,3840])}×{random.choice([720,1080,1440,2160])}" },
-        "Диагональ": lambda: {"дюймы": round(random.uniform(4.7, 85.0), 1) },
-        "Частота": lambda: {"Гц": random.choice([50,60,120,144,240,360]) },
-        "Скорость": lambda: {"единица": random.choice(["Мбит/с","страниц/мин","об/мин"]), "значение": round(random.uniform(1, 5000), 2) },
-        "Прочность": lambda: {"класс": random.choice(["низкая","средняя","высокая"]), "метод": random.choice(["Шор","Роквелл","Виккерс"]) },
-    }
-
-    def make_details_for_spec(spec_name: str) -> Dict[str, Any]:
-        # Возвращаем 1–N детальных полей по шаблону, либо generic словарь
-        n = random.randint(details_per_spec_min, details_per_spec_max)
-        if spec_name in detail_templates:
-            # генерим один «шаблонный» объект и миксуем с произвольными ключами
-            base = detail_templates[spec_name]()
-            # добавим произвольные поля
-            for i in range(max(0, n - len(base))):
-                base[f"доп_{i+1}"] = random.choice([True, False, round(random.uniform(0.1, 999.9), 2), random.randint(1,999)])
-            return base
-        else:
-            return {f"поле_{i+1}": random.choice([True, False, round(random.uniform(0.1, 999.9), 2), random.randint(1,999)]) for i in range(n)}
+    detail_templates = build_detail_templates(random)
+    class_pool = list(CLASS_POOL)
 
     # IDшники: гарантируем, что верхние (классы) > 100
     next_class_id = 101 + random.randint(0, 5000)
-    next_type_id = 100_000 + random.randint(0, 50_000)
-    next_spec_id = 200_000 + random.randint(0, 50_000)
-    next_detail_id = 1_000_000 + random.randint(0, 200_000)
+    type_ids = itertools.count(100_000 + random.randint(0, 50_000))
+    spec_ids = itertools.count(200_000 + random.randint(0, 50_000))
+    detail_ids = itertools.count(1_000_000 + random.randint(0, 200_000))
 
     used_class_names = set()
-    classes: List[Dict[str, Any]] = []
 
     # обеспечим, что уникальных классов хватит
     while len(class_pool) < num_classes:
@@ -193,49 +382,287 @@ def generate_knowledge_tree(
             name = f"{name} {random.randint(2,99)}"
         used_class_names.add(name)
 
-        num_types = random.randint(types_per_class_min, types_per_class_max)
-        types = []
-        for _ in range(num_types):
-            tname = random.choice(generic_types)
-            type_entry = {
-                "id": next_type_id,
-                "тип_товара": tname,
-                "спецификации": []
-            }
-            next_type_id += 1
-
-            num_specs = random.randint(specs_per_type_min, specs_per_type_max)
-            chosen_specs = random.sample(spec_pool, k=min(num_specs, len(spec_pool)))
-            for sname in chosen_specs:
-                spec_entry = {
-                    "id": next_spec_id,
-                    "спецификация": sname,
-                    "подробная_спецификация": {
-                        "id": next_detail_id,
-                        "значения": make_details_for_spec(sname)
-                    }
-                }
-                next_spec_id += 1
-                next_detail_id += 1
-                type_entry["спецификации"].append(spec_entry)
+        yield make_class(
+            random,
+            lambda sname: make_details_for_spec(
+                random, detail_templates, sname, details_per_spec_min, details_per_spec_max
+            ),
+            next_class_id, name, type_ids, spec_ids, detail_ids,
+            types_per_class_min, types_per_class_max,
+            specs_per_type_min, specs_per_type_max,
+        )
+        next_class_id += 1
 
-            types.append(type_entry)
 
-        cls = {
-            "id": next_class_id,
-            "класс_товара": name,
-            "типы": types
-        }
-        next_class_id += 1
-        classes.append(cls)
+# --- Режим с посевом по классам (для параллельной генерации) ---
+
+def derive_class_seed(seed: int, index: int, purpose: str = "class") -> int:
+    """Сид класса с номером index: зависит только от базового сида и номера"""
+    digest = hashlib.sha256(f"{seed}:{index}:{purpose}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
 
+
+def seeded_layout(
+    num_classes: int,
+    types_per_class_max: int,
+    specs_per_type_max: int,
+    seed: int,
+) -> Dict[str, int]:
+    """
+    Заранее выделенные диапазоны id: класс index получает свои непересекающиеся
+    окна под типы и спецификации, поэтому id не зависят от того, какой процесс
+    и в каком порядке его сгенерировал.
+    """
+    rng = random.Random(seed)
+    types_stride = types_per_class_max
+    specs_stride = types_per_class_max * min(specs_per_type_max, len(SPEC_POOL))
+    class_base = 101 + rng.randint(0, 5000)
+    type_base = 100_000 + rng.randint(0, 50_000)
+    spec_base = max(200_000 + rng.randint(0, 50_000), type_base + num_classes * types_stride)
+    detail_base = max(1_000_000 + rng.randint(0, 200_000), spec_base + num_classes * specs_stride)
     return {
-        "версия": "1.0",
-        "сгенерировано": datetime.utcnow().isoformat() + "Z",
-        "описание": "Дерево знаний: Класс -> Тип -> Спецификация -> Подробная спецификация",
+        "seed": seed,
+        "class_base": class_base,
+        "type_base": type_base,
+        "spec_base": spec_base,
+        "detail_base": detail_base,
+        "types_stride": types_stride,
+        "specs_stride": specs_stride,
+    }
+
+
+def seeded_class_names(num_classes: int, seed: int) -> List[str]:
+    """Уникальные имена классов; дешёвый последовательный проход до генерации самих классов"""
+    class_pool = list(CLASS_POOL)
+    while len(class_pool) < num_classes:
+        class_pool.append(f"Категория {len(class_pool)+1}")
+
+    used_class_names = set()
+    names = []
+    for index in range(num_classes):
+        rng = random.Random(derive_class_seed(seed, index, "name"))
+        name = rng.choice(class_pool)
+        while name in used_class_names:
+            name = f"{name} {rng.randint(2,99)}"
+        used_class_names.add(name)
+        names.append(name)
+    return names
+
+
+def make_seeded_class(
+    index: int,
+    name: str,
+    layout: Dict[str, int],
+    params: Dict[str, int],
+    make_details: Optional[Callable[[str], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    rng = random.Random(derive_class_seed(layout["seed"], index))
+    if make_details is None:
+        detail_templates = build_detail_templates(rng)
+        make_details = lambda sname: make_details_for_spec(
+            rng, detail_templates, sname, params["details_per_spec_min"], params["details_per_spec_max"]
+        )
+    spec_start = index * layout["specs_stride"]
+    return make_class(
+        rng,
+        make_details,
+        layout["class_base"] + index,
+        name,
+        itertools.count(layout["type_base"] + index * layout["types_stride"]),
+        itertools.count(layout["spec_base"] + spec_start),
+        itertools.count(layout["detail_base"] + spec_start),
+        params["types_per_class_min"],
+        params["types_per_class_max"],
+        params["specs_per_type_min"],
+        params["specs_per_type_max"],
+    )
+
+
+def make_seeded_chunk_numpy(start: int, names: List[str], layout: Dict[str, int], params: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Пачка классов с векторной генерацией подробных спецификаций.
+    Структура (типы, набор спецификаций) тянется из random.Random класса, а значения
+    всех спецификаций пачки — из numpy Generator с сидом (seed, start), поэтому
+    результат зависит от chunk_size, но не от числа процессов.
+    """
+    pending: List[Any] = []
+
+    def defer_details(sname: str) -> Dict[str, Any]:
+        details: Dict[str, Any] = {}
+        pending.append((details, sname))
+        return details
+
+    classes = [
+        make_seeded_class(start + offset, name, layout, params, defer_details)
+        for offset, name in enumerate(names)
+    ]
+    gen = np.random.default_rng(derive_class_seed(layout["seed"], start, "numpy"))
+    batch = make_details_batch_numpy(
+        gen, [sname for _, sname in pending], params["details_per_spec_min"], params["details_per_spec_max"]
+    )
+    for (details, _), values in zip(pending, batch):
+        details.update(values)
+    return classes
+
+
+def _generate_seeded_chunk(task) -> List[str]:
+    """Задача процесса-воркера: пачка классов, сразу сериализованных в JSON"""
+    start, names, layout, params, indent, backend = task
+    if backend == "numpy":
+        classes = make_seeded_chunk_numpy(start, names, layout, params)
+    else:
+        classes = [make_seeded_class(start + offset, name, layout, params) for offset, name in enumerate(names)]
+    return [json.dumps(cls, ensure_ascii=False, indent=indent) for cls in classes]
+
+
+def iter_knowledge_tree_classes_seeded(
+    num_classes: int = 30,
+    types_per_class_min: int = 8,
+    types_per_class_max: int = 18,
+    specs_per_type_min: int = 6,
+    specs_per_type_max: int = 12,
+    details_per_spec_min: int = 2,
+    details_per_spec_max: int = 6,
+    seed: int = 42,
+    workers: int = 1,
+    chunk_size: int = 16,
+    indent: Optional[int] = None,
+    backend: str = "python",
+) -> Iterator[str]:
+    """
+    Классы дерева знаний в режиме с посевом по классам, уже сериализованные в JSON
+    (формат для write_knowledge_tree_stream).
+
+    Каждый класс генерируется своим random.Random(derive_class_seed(seed, index))
+    в своих диапазонах id, поэтому результат детерминирован и не зависит от
+    workers и chunk_size. Это другой поток случайных чисел, чем у
+    iter_knowledge_tree_classes: деревья двух режимов при одном сиде различаются.
+    При workers > 1 пачки классов генерируются и сериализуются в пуле процессов;
+    в работе одновременно не больше 2 * workers пачек, так что память ограничена.
+
+    backend="numpy" генерирует значения подробных спецификаций векторно
+    (make_seeded_chunk_numpy); тогда результат детерминирован при фиксированных
+    seed и chunk_size.
+    """
+    if backend not in ("python", "numpy"):
+        raise ValueError(f"Неизвестный backend: {backend}")
+    if backend == "numpy" and np is None:
+        raise RuntimeError("Для backend='numpy' нужен NumPy: pip install numpy")
+    params = dict(
+        types_per_class_min=types_per_class_min,
+        types_per_class_max=types_per_class_max,
+        specs_per_type_min=specs_per_type_min,
+        specs_per_type_max=specs_per_type_max,
+        details_per_spec_min=details_per_spec_min,
+        details_per_spec_max=details_per_spec_max,
+    )
+    layout = seeded_layout(num_classes, types_per_class_max, specs_per_type_max, seed)
+    names = seeded_class_names(num_classes, seed)
+    tasks = (
+        (start, names[start:start + chunk_size], layout, params, indent, backend)
+        for start in range(0, num_classes, chunk_size)
+    )
+
+    if workers <= 1:
+        for task in tasks:
+            yield from _generate_seeded_chunk(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_generate_seeded_chunk, (task,)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def generate_knowledge_tree(
+    num_classes: int = 30,
+    types_per_class_min: int = 8,
+    types_per_class_max: int = 18,
+    specs_per_type_min: int = 6,
+    specs_per_type_max: int = 12,
+    details_per_spec_min: int = 2,
+    details_per_spec_max: int = 6,
+    seed: int = 42,
+    generated_at: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Генерирует дерево знаний целиком в памяти.
+    generated_at фиксирует поле "сгенерировано" (для воспроизводимого вывода).
+    """
+    classes = list(iter_knowledge_tree_classes(
+        num_classes=num_classes,
+        types_per_class_min=types_per_class_min,
+        types_per_class_max=types_per_class_max,
+        specs_per_type_min=specs_per_type_min,
+        specs_per_type_max=specs_per_type_max,
+        details_per_spec_min=details_per_spec_min,
+        details_per_spec_max=details_per_spec_max,
+        seed=seed,
+    ))
+    return {
+        "версия": TREE_VERSION,
+        "сгенерировано": generated_at or datetime.utcnow().isoformat() + "Z",
+        "описание": TREE_DESCRIPTION,
         "классы": classes
     }
 
+
+def write_knowledge_tree_stream(
+    f: TextIO,
+    classes: Iterator[Any],
+    indent: Optional[int] = None,
+    ndjson: bool = False,
+    generated_at: Optional[str] = None,
+) -> int:
+    """
+    Пишет дерево в файл по мере генерации классов, не собирая его в памяти.
+
+    JSON совпадает байт в байт с json.dump(generate_knowledge_tree(...), f,
+    ensure_ascii=False, indent=indent) при том же сиде и generated_at.
+    В режиме ndjson первая строка — заголовок без "классы", дальше по классу на строку.
+    Классы — словари или уже готовые строки JSON, сериализованные с тем же indent
+    (см. iter_knowledge_tree_classes_seeded).
+    Возвращает число записанных классов.
+    """
+    header = {
+        "версия": TREE_VERSION,
+        "сгенерировано": generated_at or datetime.utcnow().isoformat() + "Z",
+        "описание": TREE_DESCRIPTION,
+    }
+    count = 0
+
+    if ndjson:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for cls in classes:
+            f.write((cls if isinstance(cls, str) else json.dumps(cls, ensure_ascii=False)) + "\n")
+            count += 1
+        return count
+
+    # Каркас документа с пустым списком классов режется на "до [" и "]..."
+    skeleton = json.dumps({**header, "классы": []}, ensure_ascii=False, indent=indent)
+    split_at = skeleton.rindex("[]") + 1
+    prefix, suffix = skeleton[:split_at], skeleton[split_at:]
+
+    if indent is None:
+        item_prefix, separator, closing = "", ", ", ""
+    else:
+        item_prefix = "\n" + " " * (indent * 2)
+        separator, closing = ",", "\n" + " " * indent
+
+    f.write(prefix)
+    for cls in classes:
+        chunk = cls if isinstance(cls, str) else json.dumps(cls, ensure_ascii=False, indent=indent)
+        if indent is not None:
+            chunk = chunk.replace("\n", item_prefix)
+        f.write((separator if count else "") + item_prefix + chunk)
+        count += 1
+    f.write((closing if count else "") + suffix)
+    return count
+
 # --- If run as a script ---
 script_code = r'''
 #!/usr/bin/env python3
@@ -250,7 +677,13 @@ import json, random, argparse
 from datetime import datetime
 
 # (Встроенная та же логика, что в ноутбуке; для краткости вызываем уже импортированную функцию)
-from __main__ import generate_knowledge_tree
+from itr2_GPT import (
+    generate_knowledge_tree,
+    iter_knowledge_tree_classes,
+    iter_knowledge_tree_classes_seeded,
+    write_knowledge_tree_stream,
+)
+from knowledge_tree import CompactKnowledgeTree
 
 def main():
     p = argparse.ArgumentParser()
@@ -263,9 +696,20 @@ def main():
     p.add_argument("--details_max", type=int, default=6, help="Макс. полей в подробной спецификации")
     p.add_argument("--seed", type=int, default=42, help="Сид для воспроизводимости")
     p.add_argument("--out", type=str, default="knowledge_tree.json", help="Куда сохранить JSON")
+    p.add_argument("--indent", type=int, default=2, help="Отступ JSON; 0 — компактный вывод без отступов")
+    p.add_argument("--stream", action="store_true", help="Писать классы в файл по мере генерации (постоянная память)")
+    p.add_argument("--ndjson", action="store_true", help="Потоковый NDJSON: заголовок и по классу на строку")
+    p.add_argument("--generated_at", type=str, default=None, help="Зафиксировать поле 'сгенерировано'")
+    p.add_argument("--workers", type=int, default=0,
+                   help="Процессов для генерации с посевом по классам (0 — исходный последовательный режим)")
+    p.add_argument("--backend", choices=["python", "numpy"], default="python",
+                   help="Генератор значений спецификаций в режиме --workers (numpy — векторный)")
+    p.add_argument("--chunk_size", type=int, default=16, help="Классов в пачке в режиме --workers")
+    p.add_argument("--snapshot", type=str, default="",
+                   help="Дополнительно записать бинарный снимок для mmap (knowledge_tree.py)")
     args = p.parse_args()
 
-    data = generate_knowledge_tree(
+    params = dict(
         num_classes=args.num_classes,
         types_per_class_min=args.types_min,
         types_per_class_max=args.types_max,
@@ -275,33 +719,54 @@ def main():
         details_per_spec_max=args.details_max,
         seed=args.seed,
     )
+    indent = args.indent or None
     with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        if args.workers > 0:
+            classes = iter_knowledge_tree_classes_seeded(
+                **params, workers=args.workers, chunk_size=args.chunk_size,
+                indent=None if args.ndjson else indent, backend=args.backend,
+            )
+            write_knowledge_tree_stream(
+                f, classes, indent=indent, ndjson=args.ndjson, generated_at=args.generated_at,
+            )
+        elif args.stream or args.ndjson:
+            write_knowledge_tree_stream(
+                f, iter_knowledge_tree_classes(**params),
+                indent=indent, ndjson=args.ndjson, generated_at=args.generated_at,
+            )
+        else:
+            data = generate_knowledge_tree(**params, generated_at=args.generated_at)
+            json.dump(data, f, ensure_ascii=False, indent=indent)
     print(f"OK: saved -> {args.out}")
+    if args.snapshot:
+        # Снимок собирается из только что записанного файла (NDJSON читается по классу)
+        CompactKnowledgeTree.load(args.out).save_snapshot(args.snapshot)
+        print(f"OK: snapshot -> {args.snapshot}")
 
 if __name__ == "__main__":
     main()
 '''.strip("\n")
 
-# Save the script for the user
-script_path = "gen_knowledge_tree.py"
-with open(script_path, "w", encoding="utf-8") as f:
-    f.write(script_code)
-
-# Generate a sample JSON now (moderate size to keep file reasonable)
-sample = generate_knowledge_tree(
-    num_classes=30,
-    types_per_class_min=8,
-    types_per_class_max=12,
-    specs_per_type_min=6,
-    specs_per_type_max=10,
-    details_per_spec_min=2,
-    details_per_spec_max=4,
-    seed=1337,
-)
+if __name__ == "__main__":
+    # Save the script for the user
+    script_path = "gen_knowledge_tree.py"
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(script_code)
+
+    # Generate a sample JSON now (moderate size to keep file reasonable)
+    sample = generate_knowledge_tree(
+        num_classes=30,
+        types_per_class_min=8,
+        types_per_class_max=12,
+        specs_per_type_min=6,
+        specs_per_type_max=10,
+        details_per_spec_min=2,
+        details_per_spec_max=4,
+        seed=1337,
+    )
 
-out_path = "knowledge_tree_sample.json"
-with open(out_path, "w", encoding="utf-8") as f:
-    json.dump(sample, f, ensure_ascii=False, indent=2)
+    out_path = "knowledge_tree_sample.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(sample, f, ensure_ascii=False, indent=2)
 
-(out_path, script_path, len(sample["классы"]))
+    (out_path, script_path, len(sample["классы"]))
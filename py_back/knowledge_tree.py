@@ -0,0 +1,335 @@
+import json
+import math
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from tree_snapshot import Snapshot, is_snapshot, write_snapshot
+
+# Уровни дерева знаний (itr2_GPT.py): Класс -> Тип -> Спецификация.
+# Подробная спецификация хранится вместе со своей спецификацией.
+CLASS, TYPE, SPEC = 0, 1, 2
+KIND_NAMES = ("class", "type", "spec")
+NAME_KEYS = ("класс_товара", "тип_товара", "спецификация")
+CHILDREN_KEYS = ("типы", "спецификации", None)
+DETAIL_KEY = "подробная_спецификация"
+VALUES_KEY = "значения"
+
+SNAPSHOT_KIND = "knowledge_tree"
+# Колонки дерева; в снимке они лежат под теми же именами
+COLUMNS = (
+    "ids", "parent", "kind", "name", "end", "detail_id",
+    "value_start", "value_key", "value_kind", "value_number", "class_positions",
+)
+
+# Виды значений подробной спецификации
+BOOL, NUMBER, INTEGER, STRING, JSON_VALUE = range(5)
+# Целые больше 2**53 не представимы в double без потерь и хранятся как JSON
+MAX_EXACT_INTEGER = 2 ** 53
+
+
+def read_knowledge_tree(path: str):
+    """
+    Заголовок и итератор классов из JSON дерева знаний или из NDJSON
+    write_knowledge_tree_stream(ndjson=True). NDJSON читается построчно,
+    так что в памяти не бывает больше одного класса в виде словарей.
+    """
+    f = open(path, encoding="utf-8")
+    try:
+        try:
+            header = json.loads(f.readline())
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or "классы" in header:
+            f.seek(0)
+            data = json.load(f)
+            f.close()
+            return {key: value for key, value in data.items() if key != "классы"}, iter(data["классы"])
+    except BaseException:
+        f.close()
+        raise
+
+    def classes():
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, classes()
+
+
+class StringTable:
+    """Интернированные строки: каждая уникальная строка хранится один раз, узлы ссылаются на индекс"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._index[value] = index
+        return index
+
+    def find(self, value: str) -> Optional[int]:
+        return self._index.get(value)
+
+    def __getitem__(self, index: int) -> str:
+        return self.strings[index]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.strings)
+
+
+class CompactKnowledgeTree:
+    """
+    Колоночное представление дерева знаний.
+
+    Узлы (классы, типы, спецификации) лежат в параллельных типизированных
+    массивах в порядке прямого обхода: id, родитель, уровень, имя (индекс в
+    таблице строк) и конец поддерева. Значения подробных спецификаций — ещё
+    одна группа массивов (ключ, вид, число), строки и списки интернируются.
+    Ключи JSON вроде "спецификация" не хранятся вовсе — схема известна заранее.
+
+    Дерево собирается потоково (add_class), исходные словари не удерживаются;
+    to_dict() восстанавливает исходный JSON без потерь. save_snapshot() пишет
+    колонки в бинарный снимок, from_snapshot() отображает его в память без разбора.
+    """
+
+    def __init__(self, header: Optional[Dict[str, Any]] = None):
+        self.header = dict(header or {})
+        self.strings = StringTable()
+        self.ids = array("q")
+        self.parent = array("i")
+        self.kind = array("b")
+        self.name = array("i")
+        self.end = array("i")
+        self.detail_id = array("q")
+        # Значения узла i — отрезок [value_start[i], value_start[i + 1])
+        self.value_start = array("i", [0])
+        self.value_key = array("i")
+        self.value_kind = array("b")
+        self.value_number = array("d")
+        self.class_positions = array("i")
+        self._id_index: Dict[int, Any] = {}
+        self._snapshot: Optional[Snapshot] = None
+
+    # --- Построение ---
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactKnowledgeTree":
+        tree = cls({key: value for key, value in data.items() if key != "классы"})
+        tree.extend(data.get("классы", []))
+        return tree
+
+    @classmethod
+    def load(cls, path: str) -> "CompactKnowledgeTree":
+        """JSON или NDJSON дерева знаний; NDJSON разбирается по классу за раз"""
+        header, classes = read_knowledge_tree(path)
+        tree = cls(header)
+        tree.extend(classes)
+        return tree
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "CompactKnowledgeTree":
+        """Колонки и строки читаются прямо из отображённого в память снимка; дерево только для чтения"""
+        snapshot = Snapshot(path, SNAPSHOT_KIND)
+        tree = cls(snapshot.meta["header"])
+        for column in COLUMNS:
+            setattr(tree, column, snapshot.columns[column])
+        tree.strings = snapshot.strings
+        tree._id_index = {kind: snapshot.columns[f"id_index_{kind}"] for kind in (CLASS, TYPE, SPEC)}
+        tree._snapshot = snapshot
+        return tree
+
+    @classmethod
+    def open(cls, path: str) -> "CompactKnowledgeTree":
+        """Снимок отображается в память, JSON/NDJSON разбирается"""
+        return cls.from_snapshot(path) if is_snapshot(path) else cls.load(path)
+
+    def save_snapshot(self, path: str):
+        columns = {column: getattr(self, column) for column in COLUMNS}
+        for kind in (CLASS, TYPE, SPEC):
+            columns[f"id_index_{kind}"] = self._sorted_by_id(kind)
+        write_snapshot(path, SNAPSHOT_KIND, columns, list(self.strings), {"header": self.header})
+
+    def close(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+
+    def extend(self, classes: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for class_data in classes:
+            self.add_class(class_data)
+            count += 1
+        return count
+
+    def add_class(self, class_data: Dict[str, Any]):
+        if self._snapshot is not None:
+            raise RuntimeError("Дерево из снимка доступно только для чтения")
+        position = self._add_node(CLASS, class_data, -1)
+        self.class_positions.append(position)
+        for type_data in class_data.get(CHILDREN_KEYS[CLASS], []):
+            type_position = self._add_node(TYPE, type_data, position)
+            for spec_data in type_data.get(CHILDREN_KEYS[TYPE], []):
+                self._add_node(SPEC, spec_data, type_position)
+            self.end[type_position] = len(self.ids) - 1
+        self.end[position] = len(self.ids) - 1
+        self._id_index.clear()
+
+    def _add_node(self, kind: int, data: Dict[str, Any], parent: int) -> int:
+        position = len(self.ids)
+        self.ids.append(data["id"])
+        self.parent.append(parent)
+        self.kind.append(kind)
+        self.name.append(self.strings.add(data[NAME_KEYS[kind]]))
+        self.end.append(position)
+        detail = data.get(DETAIL_KEY) if kind == SPEC else None
+        if detail is None:
+            self.detail_id.append(-1)
+        else:
+            self.detail_id.append(detail["id"])
+            for key, value in detail.get(VALUES_KEY, {}).items():
+                self._add_value(key, value)
+        self.value_start.append(len(self.value_key))
+        return position
+
+    def _add_value(self, key: str, value: Any):
+        self.value_key.append(self.strings.add(key))
+        if isinstance(value, bool):
+            kind, number = BOOL, float(value)
+        elif isinstance(value, int) and abs(value) <= MAX_EXACT_INTEGER:
+            kind, number = INTEGER, float(value)
+        elif isinstance(value, float) and math.isfinite(value):
+            kind, number = NUMBER, value
+        elif isinstance(value, str):
+            kind, number = STRING, float(self.strings.add(value))
+        else:
+            kind, number = JSON_VALUE, float(self.strings.add(json.dumps(value, ensure_ascii=False)))
+        self.value_kind.append(kind)
+        self.value_number.append(number)
+
+    # --- Запросы ---
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def class_count(self) -> int:
+        return len(self.class_positions)
+
+    def _sorted_by_id(self, kind: int):
+        """Позиции узлов уровня kind, упорядоченные по id (строится при первом поиске)"""
+        index = self._id_index.get(kind)
+        if index is None:
+            positions = [position for position in range(len(self.ids)) if self.kind[position] == kind]
+            positions.sort(key=self.ids.__getitem__)
+            index = self._id_index[kind] = array("i", positions)
+        return index
+
+    def find(self, kind: int, node_id: int) -> Optional[int]:
+        """Позиция узла уровня kind с данным id (двоичный поиск) или None"""
+        index = self._sorted_by_id(kind)
+        low, high = 0, len(index)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[index[middle]] < node_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(index) and self.ids[index[low]] == node_id:
+            return index[low]
+        return None
+
+    def find_by_name(self, kind: int, name: str) -> List[int]:
+        """Позиции узлов уровня kind с точно таким именем"""
+        name_index = self.strings.find(name)
+        if name_index is None:
+            return []
+        return [
+            position for position in range(len(self.ids))
+            if self.name[position] == name_index and self.kind[position] == kind
+        ]
+
+    def children(self, position: int) -> Iterator[int]:
+        child = position + 1
+        while child <= self.end[position]:
+            yield child
+            child = self.end[child] + 1
+
+    def path(self, position: int) -> List[int]:
+        """Позиции от корня (класса) до узла"""
+        path = []
+        while position >= 0:
+            path.append(position)
+            position = self.parent[position]
+        return path[::-1]
+
+    def values(self, position: int) -> Dict[str, Any]:
+        result = {}
+        strings = self.strings
+        for i in range(self.value_start[position], self.value_start[position + 1]):
+            kind = self.value_kind[i]
+            number = self.value_number[i]
+            if kind == BOOL:
+                value = bool(number)
+            elif kind == INTEGER:
+                value = int(number)
+            elif kind == NUMBER:
+                value = number
+            elif kind == STRING:
+                value = strings[int(number)]
+            else:
+                value = json.loads(strings[int(number)])
+            result[strings[self.value_key[i]]] = value
+        return result
+
+    def node(self, position: int) -> Dict[str, Any]:
+        """Плоское описание узла без потомков"""
+        kind = self.kind[position]
+        parent = self.parent[position]
+        result = {
+            "id": self.ids[position],
+            "kind": KIND_NAMES[kind],
+            "name": self.strings[self.name[position]],
+            "parent_id": self.ids[parent] if parent >= 0 else None,
+            "descendants_count": self.end[position] - position,
+        }
+        if kind == SPEC and self.detail_id[position] >= 0:
+            result["detail_id"] = self.detail_id[position]
+            result["values"] = self.values(position)
+        return result
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        """Узел в исходной схеме JSON вместе с поддеревом; без position — всё дерево"""
+        if position is None:
+            return {**self.header, "классы": [self.to_dict(p) for p in self.class_positions]}
+        kind = self.kind[position]
+        result: Dict[str, Any] = {"id": self.ids[position], NAME_KEYS[kind]: self.strings[self.name[position]]}
+        if kind == SPEC:
+            if self.detail_id[position] >= 0:
+                result[DETAIL_KEY] = {"id": self.detail_id[position], VALUES_KEY: self.values(position)}
+        else:
+            result[CHILDREN_KEYS[kind]] = [self.to_dict(child) for child in self.children(position)]
+        return result
+
+    def iter_classes(self) -> Iterator[Dict[str, Any]]:
+        for position in self.class_positions:
+            yield self.to_dict(position)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Оценка занимаемой памяти в байтах: буферы массивов и таблица строк"""
+        array_bytes = sum(len(getattr(self, column)) * getattr(self, column).itemsize for column in COLUMNS)
+        string_bytes = sum(len(s.encode("utf-8")) for s in self.strings)
+        return {
+            "nodes": len(self.ids),
+            "values": len(self.value_key),
+            "strings": len(self.strings),
+            "array_bytes": array_bytes,
+            "string_bytes": string_bytes,
+            "total_bytes": array_bytes + string_bytes,
+        }
@@ -1,14 +1,162 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import math
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from psycopg2.extras import RealDictCursor, execute_values
 import uvicorn
 from datetime import datetime
+from itertools import chain
+import os
+import threading
+from typing import Optional
+
+from categorizer import PRODUCT_CATEGORIES, Categorizer, CategoryTree
+from change_feed import ChangeFeed, ChangeFeedFull
+from db import DatabaseConfig, PoolTimeoutError, db_pool, db_replicas
+from fast_json import FastJSONResponse, dumps_json, dumps_json_line
+from metrics import MetricsMiddleware, render_gauge, render_metrics, span
+from product_tree import ProductTreeIndex, load_product_tree, snapshot_path_for
+from queries import (
+    ADD_ITEM,
+    BULK_DELETE_ITEMS,
+    BULK_TOGGLE_ITEMS,
+    CATEGORY_STATISTICS,
+    DATABASE_ITEMS,
+    DELETE_ITEM,
+    ITEM_COLUMNS,
+    ITEMS_BY_CATEGORY,
+    TOGGLE_ITEM,
+)
+from response_cache import etag_matches, response_cache_from_env
+from schema import (
+    check_category_stats,
+    dictionary_is_current,
+    ensure_schema,
+    ensure_trigram_search,
+    fill_missing_categories,
+    has_missing_categories,
+    rebuild_category_stats,
+    sync_categories,
+)
+from structured_log import HOT_PATH, log_pipeline_from_env
+
+
+logger = logging.getLogger(__name__)
+# Логи уходят в очередь, JSON в stdout пишет отдельный поток (structured_log.py)
+log_pipeline = log_pipeline_from_env(os.environ)
+
+
+# Дерево товаров, словарь категоризации и схема БД. Вызывается один раз:
+# в мастере serve.py до fork (preload) или при старте единственного процесса
+def prepare_app():
+    global trigram_search
+    try:
+        reload_product_tree(sync=False)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Не удалось загрузить дерево товаров %s, категории из PRODUCT_CATEGORIES: %s", PRODUCT_TREE_PATH, e)
+    with db_pool.connection() as conn:
+        ensure_schema(conn)
+        trigram_search = ensure_trigram_search(conn)
+        updated = sync_categories(conn, categorize_product, categorizer.version)
+    logger.info("Категории синхронизированы, обновлено строк: %d", updated)
+    if not trigram_search:
+        logger.warning("pg_trgm недоступен: поиск по названию работает без индекса и без нечёткого совпадения")
+
+# Подготовка в мастер-процессе перед запуском воркеров (serve.py).
+# Индексы дерева и автомат категоризации строятся один раз и достаются воркерам
+# через copy-on-write (снимок дерева — через общий page cache). Соединения
+# и потоки до fork закрываются: у каждого воркера свой пул, своя лента и свой поток логов
+def preload():
+    global preloaded
+    log_pipeline.start()
+    try:
+        db_pool.open()
+        try:
+            prepare_app()
+        finally:
+            db_pool.close()
+        preloaded = True
+    finally:
+        log_pipeline.stop()
+
+preloaded = False
 
-app = FastAPI(title="Database Python API")
+
+# Пул соединений живёт всё время работы воркера
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    db_pool.open()
+    logger.info("Пул соединений открыт", extra={"pool": db_pool.stats()})
+    if not preloaded:
+        prepare_app()
+    await change_feed.start()
+    watcher = asyncio.create_task(watch_product_tree()) if PRODUCT_TREE_RELOAD_INTERVAL > 0 else None
+    replica_watcher = None
+    if db_replicas.enabled:
+        # Первая проверка до приёма запросов: реплики входят в ротацию уже проверенными
+        await asyncio.get_running_loop().run_in_executor(None, db_replicas.check_replicas)
+        replica_watcher = asyncio.create_task(watch_replicas())
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if replica_watcher is not None:
+            replica_watcher.cancel()
+        await change_feed.stop()
+        db_replicas.close()
+        db_pool.close()
+        if product_tree is not None:
+            product_tree.close()
+        log_pipeline.stop()
+
+
+app = FastAPI(title="Database Python API", lifespan=lifespan)
 
 RESOURCE = 'api'
 
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 1000
+DEFAULT_SEARCH_LIMIT = 100
+
+# Есть ли в БД pg_trgm и GIN-индекс по названию (выясняется при старте)
+trigram_search = False
+STREAM_BATCH_SIZE = 500
+
+# Дерево товаров (itr2_DS.py) загружается один раз при старте и индексируется.
+# Источник — JSON; рядом с ним хранится бинарный снимок, который отображается
+# в память: старт мгновенный, а страницы дерева делятся между воркерами через
+# page cache. Снимок пересобирается, когда JSON изменился (sha1 в снимке)
+def default_product_tree_path():
+    base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_tree_samara")
+    return base + ".json" if os.path.exists(base + ".json") else base + ".snap"
+
+PRODUCT_TREE_PATH = os.getenv("PRODUCT_TREE_PATH") or default_product_tree_path()
+PRODUCT_TREE_SNAPSHOT = snapshot_path_for(PRODUCT_TREE_PATH)
+product_tree: Optional[ProductTreeIndex] = None
+# Файл дерева проверяется раз в столько секунд и при изменении перечитывается (0 — не следить)
+PRODUCT_TREE_RELOAD_INTERVAL = float(os.getenv("PRODUCT_TREE_RELOAD_INTERVAL", 5))
+# Уровень дерева, который хранится в колонке category: category, subcategory, product_group, product
+CATEGORY_LEVEL = os.getenv("CATEGORY_LEVEL", "subcategory")
+product_tree_mtime = None
+product_tree_lock = threading.Lock()
+
+# Лента изменений товаров для клиентов (SSE и WebSocket) поверх LISTEN/NOTIFY
+change_feed = ChangeFeed(
+    DatabaseConfig.from_env(),
+    queue_size=int(os.getenv("CHANGE_FEED_QUEUE_SIZE", 100)),
+    max_subscribers=int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", 10000)),
+)
+# Пустое сообщение раз в столько секунд, чтобы прокси не закрывал простаивающее соединение
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", 15))
+
+# Как часто проверять отставание реплик чтения (DB_REPLICAS), секунд
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 2))
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,40 +165,184 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Гистограммы времени запросов и их участков (/metrics) и заголовок Server-Timing.
+# Добавлен последним, значит внешний: в total входит и обработка CORS
+app.add_middleware(MetricsMiddleware)
 
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-dbname ="fridge_db",
-user="fridge_user",
-password="1234",
-host="localhost",
-port="5432")
-        return conn
-    except Exception as e:
-        print(f"Ошибка подключения к базе данных: {e}")
-        raise
+# Переводит исключение при работе с БД в HTTP-ответ
+def database_error(message, e):
+    # Шаблон на каждое сообщение: ограничение частоты считается для каждой ошибки отдельно
+    logger.error(message + ": %s", e)
+    if isinstance(e, PoolTimeoutError):
+        return HTTPException(status_code=503, detail="База данных перегружена, повторите запрос позже")
+    return HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+
+# Автомат по ключевым словам собирается при старте, результаты кэшируются.
+# PRODUCT_CATEGORIES — словарь, пока дерево товаров не загружено, а затем запасной слой
+# для товаров, которых в дереве нет
+categorizer = Categorizer(PRODUCT_CATEGORIES, cache_size=int(os.getenv("CATEGORY_CACHE_SIZE", 10000)))
+
+# Перечитывает дерево товаров, если файл изменился: подменяет индекс дерева и словарь
+# категоризации. Запросы, уже взявшие старый индекс или снимок словаря, дорабатывают на них.
+# При смене словаря и при force сохранённые категории пересчитываются (sync=False — этим займётся вызывающий)
+def reload_product_tree(force=False, sync=True):
+    global product_tree, product_tree_mtime
+    with product_tree_lock:
+        mtime = os.stat(PRODUCT_TREE_PATH).st_mtime_ns
+        if not force and mtime == product_tree_mtime:
+            return {"reloaded": False, "dictionary_changed": False, "updated_rows": 0}
+        tree = load_product_tree(PRODUCT_TREE_PATH, PRODUCT_TREE_SNAPSHOT)
+        changed = categorizer.reload(CategoryTree(tree, CATEGORY_LEVEL, fallback=PRODUCT_CATEGORIES))
+        product_tree, product_tree_mtime = tree, mtime
+        logger.info(
+            "Дерево товаров загружено: %d узлов из %s, словарь %s",
+            len(tree), PRODUCT_TREE_PATH, "обновлён" if changed else "не изменился",
+        )
+        updated = 0
+        if (changed or force) and sync:
+            with db_pool.connection() as conn:
+                updated = sync_categories(conn, categorize_product, categorizer.version)
+            data_changed()
+            logger.info("Категории пересчитаны по новому словарю, обновлено строк: %d", updated)
+        return {"reloaded": True, "dictionary_changed": changed, "updated_rows": updated}
 
-# База знаний о категориях продуктов
-PRODUCT_CATEGORIES = {
-    "молочные": ["молоко", "сыр", "йогурт", "кефир", "творог", "сметана", "масло", "сливки"],
-    "овощи": ["помидор", "огурец", "картофель", "морковь", "лук", "капуста", "перец"],
-    "фрукты": ["яблоко", "банан", "апельсин", "лимон", "груша", "виноград"],
-    "мясо": ["колбаса", "сосиски", "курица", "говядина", "свинина", "ветчина"],
-    "напитки": ["сок", "вода", "чай", "кофе", "лимонад", "компот"],
-    "хлеб": ["хлеб", "батон", "булка", "лаваш", "сухари"],
-    "яйца": ["яйца", "яичница", "омлет"]
-}
+# Фоновая проверка файла дерева; перечитывание идёт в потоке, не блокируя цикл событий
+async def watch_product_tree():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(PRODUCT_TREE_RELOAD_INTERVAL)
+        try:
+            await loop.run_in_executor(None, reload_product_tree)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.error("Не удалось перечитать дерево товаров: %s", e)
+
+# Отставание реплик проверяется раз в DB_REPLICA_CHECK_INTERVAL секунд в потоке
+async def watch_replicas():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+        try:
+            await loop.run_in_executor(None, db_replicas.check_replicas)
+        except Exception as e:
+            logger.error("Не удалось проверить реплики: %s", e)
 
 # Определяет категорию продукта
 def categorize_product(product_name):
-    product_lower = product_name.lower()
-    for category, keywords in PRODUCT_CATEGORIES.items():
-        for keyword in keywords:
-            if keyword in product_lower:
-                return category
-    return "другое"
+    return categorizer.categorize(product_name)
+
+# Категории, чьё название содержит запрос (та же семантика, что и раньше в фильтре)
+def matching_categories(query):
+    query = query.lower()
+    return [category for category in [*categorizer.categories, categorizer.default] if query in category.lower()]
+
+# Ключевые слова категории с таким названием (без учёта регистра)
+def category_keywords(name):
+    return [
+        keyword
+        for category, keywords in categorizer.categories.items() if category.lower() == name
+        for keyword in keywords
+    ]
+
+# Экранирует спецсимволы LIKE, чтобы запрос искался как обычная подстрока
+def like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# Товар из БД в ответ API; категория берётся из колонки, если она уже посчитана.
+# Строка курсора дополняется на месте, без копии: она нужна только для этого ответа
+def with_category(item):
+    if not item.get("category"):
+        item["category"] = categorize_product(item["name"])
+    return item
+
+# Кэш готовых ответов читающих эндпоинтов; изменяющие эндпоинты сбрасывают его через bump().
+# Изменения мимо этого процесса (другие воркеры, Node-бэкенд, psql, триггеры) сбрасывают
+# кэш через ленту изменений: NOTIFY приходит на каждое изменение fridge_items
+response_cache = response_cache_from_env(os.environ)
+change_feed.on_change = response_cache.bump
+
+# Кука клиента, который только что писал: пока она жива, его чтения видят его запись,
+# в каком бы воркере она ни случилась. Они идут мимо локального кэша ответов (другой
+# воркер сбросит его, только когда получит NOTIFY) и, с репликами, читают с fresh=True.
+# Живёт FRESH_READS_SECONDS, а с репликами — не меньше DB_REPLICA_MAX_LAG
+FRESH_READS_COOKIE = "fresh_reads"
+FRESH_READS_SECONDS = float(os.getenv("FRESH_READS_SECONDS", 5))
+
+# Вызывается после коммита изменения: сбрасывает кэш ответов и ставит клиенту куку свежих чтений
+def data_changed(response=None):
+    response_cache.bump()
+    if response is not None:
+        max_age = max(FRESH_READS_SECONDS, db_replicas.max_lag) if db_replicas.enabled else FRESH_READS_SECONDS
+        response.set_cookie(FRESH_READS_COOKIE, "1", max_age=math.ceil(max_age), httponly=True, samesite="lax")
+
+def wants_fresh_reads(request):
+    return FRESH_READS_COOKIE in request.cookies
+
+# Категория названия и версия словаря, с которой её можно записать (dictionary_is_current).
+# Версия берётся до категоризации: если словарь подменят между ними, категория окажется
+# новее версии, и её запись либо отклонится, либо попадёт в пересчёт таблицы
+def categorize_for_write(name):
+    version = categorizer.version
+    return categorize_product(name), version
+
+# Досчитывает строки без категории, если словарь процесса совпадает с записанным в БД;
+# воркер, ещё не перечитавший дерево, оставляет их актуальному. Транзакция закрывается
+# сразу: иначе блокировка версии словаря держалась бы всё чтение
+def fill_current_categories(conn):
+    with conn.cursor() as cursor:
+        if dictionary_is_current(conn, categorizer.version):
+            fill_missing_categories(cursor, categorize_product)
+    conn.commit()
+
+# Соединение чтения, на котором у всех строк уже посчитана категория. Строки, вставленные
+# мимо API, досчитываются (частичный индекс, обычно пусто): на том же соединении или,
+# если чтение с реплики, в primary — и тогда читать дальше нужно из primary, где они уже есть
+@contextmanager
+def categorized_read_connection(fresh=False):
+    with db_replicas.read_connection(fresh) as conn:
+        with conn.cursor() as cursor:
+            missing = has_missing_categories(cursor)
+        if missing and not db_replicas.enabled:
+            fill_current_categories(conn)
+            missing = False
+        if not missing:
+            yield conn
+            return
+    with db_pool.connection() as primary:
+        fill_current_categories(primary)
+        yield primary
+
+# Отдаёт JSON из кэша ответов (build() считается только при промахе) с сильным ETag;
+# If-None-Match с тем же ETag получает 304 без тела
+def cached_json(request, endpoint, params, build):
+    # Локальный кэш узнаёт об изменениях других воркеров и клиентов БД только из ленты
+    # изменений: пока она не подключена, он не используется, иначе отдавал бы устаревшие ответы.
+    # Клиент, который только что писал, тоже читает мимо него: NOTIFY о его записи мог ещё
+    # не дойти до этого воркера. Общий кэш сбрасывается пишущим воркером сразу
+    if not response_cache.enabled or not (response_cache.shared or change_feed.connected):
+        return FastJSONResponse(build())
+    if not response_cache.shared and wants_fresh_reads(request):
+        return FastJSONResponse(build())
+    try:
+        key = response_cache.key(endpoint, params)
+        entry = response_cache.get(key)
+    except Exception as e:
+        logger.warning("Кэш ответов недоступен: %s", e)
+        return FastJSONResponse(build())
+    if entry is None:
+        body = dumps_json(build())
+        try:
+            entry = response_cache.put(key, body)
+        except Exception as e:
+            logger.warning("Не удалось сохранить ответ в кэш: %s", e)
+            return Response(content=body, media_type="application/json")
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/")
 async def root():
@@ -59,262 +351,630 @@ async def root():
         "timestamp": datetime.now().isoformat()
     }
 
-# Получает все товары из базы данных с категориями
+# Условие keyset-пагинации по индексу (created_at DESC, id DESC)
+def keyset_condition(after_created_at, after_id):
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_created_at и after_id передаются вместе")
+    if after_created_at is None:
+        return "", ()
+    return "WHERE (created_at, id) < (%s, %s) ", (after_created_at, after_id)
+
+# Построчно отдаёт товары в NDJSON через серверный курсор, не держа таблицу в памяти
+def stream_database_items(where, params, limit, fresh):
+    with db_replicas.read_connection(fresh) as conn, conn.cursor(name="database_items_stream", cursor_factory=RealDictCursor) as cursor:
+        cursor.itersize = STREAM_BATCH_SIZE
+        # Серверный курсор: DECLARE не принимает EXECUTE, поэтому запрос не подготавливается
+        query = f"SELECT {ITEM_COLUMNS} FROM fridge_items " + where + "ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params = (*params, limit)
+        cursor.execute(query, params)
+        # Первый yield до чтения строк: соединение уже получено, ошибки пула видны до отправки заголовков
+        yield b""
+        for item in cursor:
+            yield dumps_json_line(with_category(item))
+
+# Получает товары из базы данных с категориями.
+# Без параметров возвращает весь список; с limit — страницу и курсор следующей;
+# со stream=true — поток NDJSON
 @app.get("/{RESOURCE}/database-items")
-async def get_database_items():
+def get_database_items(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    stream: bool = False,
+):
+    where, params = keyset_condition(after_created_at, after_id)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        if stream:
+            items_stream = stream_database_items(where, params, limit, wants_fresh_reads(request))
+            first_chunk = next(items_stream)
+            return StreamingResponse(chain([first_chunk], items_stream), media_type="application/x-ndjson")
+        
+        return cached_json(
+            request,
+            "database-items",
+            {"limit": limit, "after_created_at": after_created_at, "after_id": after_id},
+            lambda: load_database_items(params, limit),
+        )
         
-        cursor.execute("SELECT * FROM fridge_items ORDER BY created_at DESC")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise database_error("Ошибка при получении данных", e)
+
+# Весь список товаров или страница с курсором следующей
+def load_database_items(params, limit):
+    query = DATABASE_ITEMS[(bool(params), limit is not None)]
+    if limit is not None:
+        # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+        params = (*params, limit + 1)
+    
+    # Ответ ляжет в кэш под текущей версией: читаем не раньше последнего коммита
+    with db_replicas.read_connection(fresh=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        query.execute(cursor, params)
         items = cursor.fetchall()
-        
-        # Добавляем категории к каждому товару
-        processed_items = []
-        for item in items:
-            category = categorize_product(item["name"])
-            processed_item = dict(item)
-            processed_item["category"] = category
-            processed_items.append(processed_item)
-        
-        cursor.close()
-        conn.close()
-        
-        print(f"Обработано {len(processed_items)} товаров из базы данных")
+    
+    if limit is None:
+        with span("categorize"):
+            processed_items = [with_category(item) for item in items]
+        logger.info("Обработано %d товаров из базы данных", len(processed_items), extra=HOT_PATH)
         return processed_items
-        
-    except Exception as e:
-        print(f"Ошибка при получении данных: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+    
+    has_more = len(items) > limit
+    with span("categorize"):
+        processed_items = [with_category(item) for item in items[:limit]]
+    next_cursor = None
+    if has_more:
+        last_item = processed_items[-1]
+        next_cursor = {"after_created_at": last_item["created_at"], "after_id": last_item["id"]}
+    
+    return {
+        "count": len(processed_items),
+        "items": processed_items,
+        "next_cursor": next_cursor
+    }
 
 @app.post("/{RESOURCE}/items/add")
-async def add_item(item_data: dict):
+def add_item(item_data: dict, response: Response):
+    name = item_data.get("name", "")
+    if not isinstance(name, str):
+        raise HTTPException(status_code=400, detail="Название товара должно быть строкой")
+    name = name.strip()
+    is_in_fridge = item_data.get("isInFridge", True)
+    
+    if not name:
+        raise HTTPException(status_code=400, detail="Название товара обязательно")
+    if not isinstance(is_in_fridge, bool):
+        raise HTTPException(status_code=400, detail="Поле isInFridge должно быть true или false")
+    
     try:
-        name = item_data.get("name", "").strip()
-        is_in_fridge = item_data.get("isInFridge", True)
-        
-        if not name:
-            raise HTTPException(status_code=400, detail="Название товара обязательно")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute(
-            "INSERT INTO fridge_items (name, is_in_fridge) VALUES (%s, %s) RETURNING *",
-            (name, is_in_fridge)
-        )
-        
-        new_item = cursor.fetchone()
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            category, version = categorize_for_write(name)
+            if not dictionary_is_current(conn, version):
+                category = None
+            ADD_ITEM.execute(cursor, (name, is_in_fridge, category))
+            new_item = cursor.fetchone()
+            conn.commit()
+            data_changed(response)
         
         if new_item:
-            print(f"Добавлен новый товар: {name}")
-            return dict(new_item)
+            logger.info("Добавлен новый товар: %s", name, extra={"item_id": new_item["id"]})
+            return with_category(dict(new_item))
         else:
             raise HTTPException(status_code=500, detail="Не удалось создать товар")
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Ошибка при добавлении товара: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при добавлении товара", e)
 
 @app.patch("/{RESOURCE}/items/move/{item_id}/toggle")
-async def toggle_item_position(item_id: int):
+def toggle_item_position(item_id: int, response: Response):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Получаем текущее состояние
-        cursor.execute("SELECT is_in_fridge FROM fridge_items WHERE id = %s", (item_id,))
-        current_item = cursor.fetchone()
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Меняем состояние одним оператором: без гонки между чтением и записью
+            TOGGLE_ITEM.execute(cursor, (item_id,))
+            updated_item = cursor.fetchone()
+            conn.commit()
         
-        if not current_item:
+        if not updated_item:
             raise HTTPException(status_code=404, detail="Товар не найден")
+        data_changed(response)
         
-        # Меняем состояние
-        new_state = not current_item["is_in_fridge"]
-        cursor.execute(
-            "UPDATE fridge_items SET is_in_fridge = %s WHERE id = %s RETURNING *",
-            (new_state, item_id)
-        )
-        
-        updated_item = cursor.fetchone()
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
-        if updated_item:
-            action = "положен в холодильник" if new_state else "вынут из холодильника"
-            print(f"Товар '{updated_item['name']}' {action}")
-            return dict(updated_item)
-        else:
-            raise HTTPException(status_code=500, detail="Не удалось обновить товар")
+        action = "положен в холодильник" if updated_item["is_in_fridge"] else "вынут из холодильника"
+        logger.info("Товар '%s' %s", updated_item["name"], action, extra={"item_id": item_id})
+        return dict(updated_item)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Ошибка при перемещении товара: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при перемещении товара", e)
 
 @app.delete("/{RESOURCE}/items/remove/{item_id}")
-async def delete_item(item_id: int):
+def delete_item(item_id: int, response: Response):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Удаляем товар; RETURNING отдаёт его данные для ответа и логов
+            DELETE_ITEM.execute(cursor, (item_id,))
+            deleted_item = cursor.fetchone()
+            conn.commit()
         
-        # Сначала получаем информацию о товаре для логов
-        cursor.execute("SELECT name FROM fridge_items WHERE id = %s", (item_id,))
-        item = cursor.fetchone()
-        
-        if not item:
+        if not deleted_item:
             raise HTTPException(status_code=404, detail="Товар не найден")
+        data_changed(response)
         
-        # Удаляем товар
-        cursor.execute("DELETE FROM fridge_items WHERE id = %s RETURNING *", (item_id,))
-        deleted_item = cursor.fetchone()
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
-        if deleted_item:
-            print(f"Удален товар: {item['name']}")
-            return {
-                "message": "Товар успешно удален",
-                "deleted_item": dict(deleted_item)
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Не удалось удалить товар")
+        logger.info("Удален товар: %s", deleted_item["name"], extra={"item_id": item_id})
+        return {
+            "message": "Товар успешно удален",
+            "deleted_item": dict(deleted_item)
+        }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Ошибка при удалении товара: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при удалении товара", e)
 
-@app.get("/{RESOURCE}/filter-by-category/{category}")
-async def filter_by_category(category: str):
+# Достаёт список из тела пакетного запроса и проверяет его размер
+def bulk_payload(data, key):
+    values = data.get(key)
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail=f"Поле '{key}' должно быть непустым списком")
+    if len(values) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Не больше {MAX_BULK_SIZE} элементов за запрос")
+    return values
+
+def bulk_ids(data):
+    ids = bulk_payload(data, "ids")
+    if not all(isinstance(item_id, int) and not isinstance(item_id, bool) for item_id in ids):
+        raise HTTPException(status_code=400, detail="Поле 'ids' должно содержать целые числа")
+    return list(dict.fromkeys(ids))
+
+# Добавляет пачку товаров одним INSERT ... VALUES в одной транзакции
+@app.post("/{RESOURCE}/items/bulk/add")
+def bulk_add_items(bulk_data: dict, response: Response):
+    items = bulk_payload(bulk_data, "items")
+    # Версия словаря до категоризации, см. categorize_for_write
+    version = categorizer.version
+    
+    results = [None] * len(items)
+    rows = []
+    positions = []
+    for index, item_data in enumerate(items):
+        name = item_data.get("name", "") if isinstance(item_data, dict) else ""
+        if not isinstance(name, str):
+            results[index] = {"index": index, "status": "error", "detail": "Название товара должно быть строкой"}
+            continue
+        name = name.strip()
+        if not name:
+            results[index] = {"index": index, "status": "error", "detail": "Название товара обязательно"}
+            continue
+        is_in_fridge = item_data.get("isInFridge", True)
+        if not isinstance(is_in_fridge, bool):
+            results[index] = {"index": index, "status": "error", "detail": "Поле isInFridge должно быть true или false"}
+            continue
+        rows.append((name, is_in_fridge, categorize_product(name)))
+        positions.append(index)
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("SELECT * FROM fridge_items ORDER BY created_at DESC")
-        all_items = cursor.fetchall()
-        
-        # Фильтруем по категории
-        filtered_items = []
-        for item in all_items:
-            item_category = categorize_product(item["name"])
-            if category.lower() in item_category.lower():
-                processed_item = dict(item)
-                processed_item["category"] = item_category
-                filtered_items.append(processed_item)
+        if rows:
+            with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                if not dictionary_is_current(conn, version):
+                    rows = [(name, is_in_fridge, None) for name, is_in_fridge, _ in rows]
+                created = execute_values(
+                    cursor,
+                    "INSERT INTO fridge_items (name, is_in_fridge, category) VALUES %s RETURNING " + ITEM_COLUMNS,
+                    rows,
+                    page_size=len(rows),
+                    fetch=True
+                )
+                conn.commit()
+                data_changed(response)
+            for index, new_item in zip(positions, created):
+                results[index] = {"index": index, "status": "created", "item": with_category(dict(new_item))}
+        
+        logger.info("Пакетно добавлено %d из %d товаров", len(rows), len(items))
+        return {
+            "created": len(rows),
+            "failed": len(items) - len(rows),
+            "results": results
+        }
         
-        cursor.close()
-        conn.close()
+    except Exception as e:
+        raise database_error("Ошибка при пакетном добавлении товаров", e)
+
+# Переключает положение пачки товаров одним UPDATE
+@app.patch("/{RESOURCE}/items/bulk/toggle")
+def bulk_toggle_items(bulk_data: dict, response: Response):
+    ids = bulk_ids(bulk_data)
+    try:
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            BULK_TOGGLE_ITEMS.execute(cursor, (ids,))
+            updated = {item["id"]: dict(item) for item in cursor.fetchall()}
+            conn.commit()
+        
+        if updated:
+            data_changed(response)
+        
+        results = [
+            {"id": item_id, "status": "updated", "item": updated[item_id]} if item_id in updated
+            else {"id": item_id, "status": "not_found"}
+            for item_id in ids
+        ]
+        logger.info("Пакетно перемещено %d из %d товаров", len(updated), len(ids))
+        return {
+            "updated": len(updated),
+            "not_found": len(ids) - len(updated),
+            "results": results
+        }
         
-        print(f"Найдено {len(filtered_items)} товаров в категории '{category}'")
+    except Exception as e:
+        raise database_error("Ошибка при пакетном перемещении товаров", e)
+
+# Удаляет пачку товаров одним DELETE
+@app.delete("/{RESOURCE}/items/bulk/remove")
+def bulk_delete_items(bulk_data: dict, response: Response):
+    ids = bulk_ids(bulk_data)
+    try:
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            BULK_DELETE_ITEMS.execute(cursor, (ids,))
+            deleted = {item["id"]: dict(item) for item in cursor.fetchall()}
+            conn.commit()
+        
+        if deleted:
+            data_changed(response)
+        
+        results = [
+            {"id": item_id, "status": "deleted", "deleted_item": deleted[item_id]} if item_id in deleted
+            else {"id": item_id, "status": "not_found"}
+            for item_id in ids
+        ]
+        logger.info("Пакетно удалено %d из %d товаров", len(deleted), len(ids))
         return {
-            "category": category,
-            "count": len(filtered_items),
-            "items": filtered_items
+            "deleted": len(deleted),
+            "not_found": len(ids) - len(deleted),
+            "results": results
         }
         
     except Exception as e:
-        print(f"Ошибка при фильтрации: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при пакетном удалении товаров", e)
+
+@app.get("/{RESOURCE}/filter-by-category/{category}")
+def filter_by_category(category: str, request: Request):
+    try:
+        return cached_json(
+            request,
+            "filter-by-category",
+            {"category": category, "dictionary": categorizer.version},
+            lambda: load_items_by_category(category),
+        )
+    except Exception as e:
+        raise database_error("Ошибка при фильтрации", e)
+
+def load_items_by_category(category):
+    with categorized_read_connection(fresh=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        # Фильтруем по категории через индекс
+        ITEMS_BY_CATEGORY.execute(cursor, (matching_categories(category),))
+        filtered_items = cursor.fetchall()
+    
+    logger.info("Найдено %d товаров в категории '%s'", len(filtered_items), category, extra=HOT_PATH)
+    return {
+        "category": category,
+        "count": len(filtered_items),
+        "items": filtered_items
+    }
 
 
 # Возвращает список всех категорий
 @app.get("/{RESOURCE}/categories")
-async def get_categories():
+def get_categories(request: Request):
+    return cached_json(
+        request,
+        "categories",
+        {"dictionary": categorizer.version},
+        lambda: {
+            "categories": list(categorizer.categories.keys()),
+            "total_categories": len(categorizer.categories)
+        },
+    )
+
+# Счётчики кэша категоризации
+@app.get("/{RESOURCE}/categories/cache-stats")
+async def get_category_cache_stats():
+    return categorizer.stats()
+
+# Счётчики кэша ответов
+@app.get("/{RESOURCE}/response-cache/stats")
+def get_response_cache_stats():
+    return response_cache.stats()
+
+# Категория названия по всем уровням дерева товаров
+@app.get("/{RESOURCE}/categorize")
+async def categorize_name(name: str):
+    return {"name": name, **categorizer.classify(name)}
+
+# Принудительно перечитывает дерево товаров и пересчитывает категории в БД
+@app.post("/{RESOURCE}/categories/reload")
+def reload_categories():
+    try:
+        result = reload_product_tree(force=True)
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=500, detail=f"Не удалось загрузить дерево товаров: {e}")
+    except Exception as e:
+        raise database_error("Ошибка при пересчёте категорий", e)
+    return {**result, "dictionary_version": categorizer.version, "total_categories": len(categorizer.categories)}
+
+# Индекс дерева товаров; 503, если файл дерева не загрузился
+def loaded_product_tree():
+    if product_tree is None:
+        raise HTTPException(status_code=503, detail="Дерево товаров не загружено")
+    return product_tree
+
+# Выполняет запрос к индексу дерева; неизвестный id узла — 404
+def product_tree_query(query, *args, **kwargs):
+    try:
+        return query(*args, **kwargs)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Узел дерева не найден")
+
+# Сводка по дереву товаров и его корневые категории
+@app.get("/{RESOURCE}/product-tree")
+async def get_product_tree():
+    tree = loaded_product_tree()
+    return {**tree.stats(), "roots": tree.roots()}
+
+# Узел по id: сам узел, его дети и путь до корня
+@app.get("/{RESOURCE}/product-tree/nodes/{node_id}")
+async def get_product_tree_node(node_id: int):
+    tree = loaded_product_tree()
+    return {
+        "node": product_tree_query(tree.node, node_id),
+        "children": tree.children(node_id),
+        "path": tree.path_to_root(node_id)[::-1],
+        "interval": tree.interval(node_id),
+    }
+
+# Все потомки узла (срез прямого обхода), опционально только заданного типа
+@app.get("/{RESOURCE}/product-tree/nodes/{node_id}/descendants")
+async def get_product_tree_descendants(
+    node_id: int,
+    node_type: Optional[str] = Query(None, alias="type"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    tree = loaded_product_tree()
+    total = product_tree_query(tree.descendant_count, node_id, node_type)
+    items = tree.descendants(node_id, node_type, offset, limit)
+    return {
+        "node_id": node_id,
+        "type": node_type,
+        "total": total,
+        "count": len(items),
+        "has_more": offset + len(items) < total,
+        "items": items,
+    }
+
+# Путь от корня до узла
+@app.get("/{RESOURCE}/product-tree/nodes/{node_id}/path")
+async def get_product_tree_path(node_id: int):
+    tree = loaded_product_tree()
+    path = product_tree_query(tree.path_to_root, node_id)[::-1]
+    return {"node_id": node_id, "depth": len(path) - 1, "path": path}
+
+# Лежит ли узел под другим узлом (проверка по интервалам, O(1))
+@app.get("/{RESOURCE}/product-tree/nodes/{node_id}/is-under/{ancestor_id}")
+async def get_product_tree_is_under(node_id: int, ancestor_id: int):
+    tree = loaded_product_tree()
     return {
-        "categories": list(PRODUCT_CATEGORIES.keys()),
-        "total_categories": len(PRODUCT_CATEGORIES)
+        "node_id": node_id,
+        "ancestor_id": ancestor_id,
+        "is_under": product_tree_query(tree.is_descendant, node_id, ancestor_id),
     }
 
-# Поиск продуктов по категории или названию в базе данных
+# Поиск продуктов по категории или названию в базе данных.
+# Подстроки и нечёткие совпадения по названию обслуживает GIN-индекс pg_trgm;
+# результаты ранжируются: совпадения по категории, затем по похожести названия
 @app.post("/{RESOURCE}/search-products")
-async def search_products(search_data: dict):
+def search_products(search_data: dict, request: Request):
     search_query = search_data.get("query", "").lower().strip()
     
     if not search_query:
         return {"error": "Пустой поисковый запрос"}
     
+    limit = search_data.get("limit", DEFAULT_SEARCH_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit должен быть целым от 1 до {MAX_PAGE_SIZE}")
+    
+    # Совпадение с категорией, названием или ключевыми словами категории с таким именем
+    matched_categories = matching_categories(search_query)
+    params = {
+        "query": search_query,
+        "categories": matched_categories,
+        "patterns": [
+            f"%{like_escape(keyword)}%"
+            for keyword in [search_query, *category_keywords(search_query)]
+        ],
+        "limit": limit + 1,
+    }
+    if trigram_search:
+        rank = "word_similarity(%(query)s, lower(name))"
+        fuzzy = " OR %(query)s <%% lower(name)"
+    else:
+        rank = "0.0"
+        fuzzy = ""
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("SELECT * FROM fridge_items ORDER BY created_at DESC")
-        all_items = cursor.fetchall()
-        
-        # Ищем по категории или названию
-        found_items = []
-        for item in all_items:
-            item_category = categorize_product(item["name"])
-            item_name_lower = item["name"].lower()
-            
-            # Проверяем совпадение с категорией или названием
-            if (search_query in item_category or 
-                search_query in item_name_lower or
-                any(keyword in item_name_lower for keyword in PRODUCT_CATEGORIES.get(search_query, []))):
-                
-                processed_item = dict(item)
-                processed_item["category"] = item_category
-                processed_item["match_type"] = "category" if search_query in item_category else "name"
-                found_items.append(processed_item)
-        
-        cursor.close()
-        conn.close()
-        
-        print(f"По запросу '{search_query}' найдено {len(found_items)} товаров")
-        return {
+        with categorized_read_connection(wants_fresh_reads(request)) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                f"SELECT {ITEM_COLUMNS}, CASE WHEN category = ANY(%(categories)s) THEN 1.0 ELSE {rank} END AS rank "
+                "FROM fridge_items "
+                f"WHERE category = ANY(%(categories)s) OR lower(name) LIKE ANY(%(patterns)s){fuzzy} "
+                "ORDER BY rank DESC, created_at DESC, id DESC LIMIT %(limit)s",
+                params
+            )
+            rows = cursor.fetchall()
+        
+        found_items = rows[:limit]
+        for item in found_items:
+            item["rank"] = round(float(item["rank"]), 4)
+            # Те же категории, что отобрал запрос: названия из дерева пишутся с заглавной буквы
+            item["match_type"] = "category" if item["category"] in matched_categories else "name"
+        
+        logger.info("По запросу '%s' найдено %d товаров", search_query, len(found_items), extra=HOT_PATH)
+        return FastJSONResponse({
             "search_query": search_query,
             "found_count": len(found_items),
+            "has_more": len(rows) > limit,
             "items": found_items
-        }
+        })
         
     except Exception as e:
-        print(f"Ошибка при поиске: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при поиске", e)
 
 
 # Возвращает статистику по категориям
+# timestamp в закэшированном ответе — время подсчёта
 @app.get("/{RESOURCE}/statistics")
-async def get_statistics():
+def get_statistics(request: Request):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("SELECT * FROM fridge_items")
-        all_items = cursor.fetchall()
-        
-        # Считаем статистику по категориям
-        category_stats = {}
-        for item in all_items:
-            category = categorize_product(item["name"])
-            if category not in category_stats:
-                category_stats[category] = {"total": 0, "in_fridge": 0}
-            
-            category_stats[category]["total"] += 1
-            if item["is_in_fridge"]:
-                category_stats[category]["in_fridge"] += 1
-        
-        cursor.close()
-        conn.close()
-        
+        return cached_json(request, "statistics", {"dictionary": categorizer.version}, load_statistics)
+    except Exception as e:
+        raise database_error("Ошибка при получении статистики", e)
+
+def load_statistics():
+    with categorized_read_connection(fresh=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        # Счётчики поддерживаются триггерами, чтение — O(число категорий)
+        CATEGORY_STATISTICS.execute(cursor)
+        category_stats = {
+            row["category"]: {"total": row["total"], "in_fridge": row["in_fridge"]}
+            for row in cursor.fetchall()
+        }
+    
+    return {
+        "total_products": sum(stats["total"] for stats in category_stats.values()),
+        "categories": category_stats,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+# Служебные эндпоинты /admin/ — только напрямую с машины API (curl 127.0.0.1:8000/api/admin/...).
+# nginx их не проксирует (location /py/admin/), а проксированный запрос несёт X-Forwarded-For
+def require_local_admin(request):
+    client = request.client.host if request.client else None
+    if client not in ("127.0.0.1", "::1") or "x-forwarded-for" in request.headers or "x-real-ip" in request.headers:
+        raise HTTPException(status_code=403, detail="Служебный эндпоинт доступен только напрямую с сервера API")
+
+# Сверка счётчиков статистики с полным пересчётом по таблице; repair пересобирает разошедшиеся
+def reconcile_statistics(repair):
+    try:
+        with db_pool.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            mismatches = [dict(row) for row in check_category_stats(cursor)]
+            if mismatches and repair:
+                rebuild_category_stats(cursor)
+                conn.commit()
+                data_changed()
+        
+        if mismatches:
+            logger.warning("Статистика расходится с пересчётом в %d категориях", len(mismatches))
         return {
-            "total_products": len(all_items),
-            "categories": category_stats,
-            "timestamp": datetime.now().isoformat()
+            "consistent": not mismatches,
+            "mismatches": mismatches,
+            "repaired": bool(mismatches) and repair
         }
         
     except Exception as e:
-        print(f"Ошибка при получении статистики: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+        raise database_error("Ошибка при проверке статистики", e)
+
+# Только сверка: полный пересчёт по таблице, без изменений
+@app.get("/{RESOURCE}/admin/statistics/check")
+def check_statistics(request: Request):
+    require_local_admin(request)
+    return reconcile_statistics(repair=False)
+
+# Сверка и пересборка category_stats под блокировкой, если счётчики разошлись
+@app.post("/{RESOURCE}/admin/statistics/repair")
+def repair_statistics(request: Request):
+    require_local_admin(request)
+    return reconcile_statistics(repair=True)
+
+
+# Лента изменений товаров в формате Server-Sent Events
+@app.get("/{RESOURCE}/changes/stream")
+async def stream_changes():
+    try:
+        subscriber = change_feed.subscribe()
+    except ChangeFeedFull as e:
+        raise HTTPException(status_code=503, detail=f"Слишком много подписчиков: {e}")
+
+    async def events():
+        try:
+            # Браузер переподключается через 3 секунды после обрыва
+            yield "retry: 3000\n\n"
+            async for message in change_feed.messages(subscriber, CHANGE_FEED_HEARTBEAT):
+                yield ": ping\n\n" if message is None else f"data: {message}\n\n"
+        finally:
+            change_feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Та же лента изменений через WebSocket
+@app.websocket("/{RESOURCE}/changes/ws")
+async def websocket_changes(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        subscriber = change_feed.subscribe()
+    except ChangeFeedFull:
+        # 1013 — «попробуйте позже»
+        await websocket.close(code=1013)
+        return
+    try:
+        async for message in change_feed.messages(subscriber, CHANGE_FEED_HEARTBEAT):
+            await websocket.send_text('{"type": "ping"}' if message is None else message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        change_feed.unsubscribe(subscriber)
+
+# Состояние ленты изменений
+@app.get("/{RESOURCE}/changes/stats")
+async def get_change_feed_stats():
+    return change_feed.stats()
+
+
+# Метрики в текстовом формате Prometheus. Путь без /api: наружу через nginx не публикуется,
+# Prometheus забирает его напрямую с порта приложения. Счётчики у каждого процесса свои:
+# под serve.py с несколькими воркерами ответ описывает только воркер, принявший запрос
+@app.get("/metrics")
+def get_metrics():
+    pool = db_pool.stats()
+    feed = change_feed.stats()
+    logs = log_pipeline.stats()
+    return PlainTextResponse(
+        render_metrics([
+            *render_gauge("db_pool_in_use", "Соединения пула, выданные обработчикам", pool["in_use"]),
+            *render_gauge("db_pool_max_size", "Размер пула соединений", pool["max_size"]),
+            *render_gauge("change_feed_subscribers", "Подписчики ленты изменений", feed["subscribers"]),
+            *render_gauge("log_records_dropped", "Записи лога, не поместившиеся в очередь", logs["dropped"]),
+            *render_gauge("log_records_suppressed", "Записи лога, подавленные ограничением частоты", logs["suppressed"]),
+        ]),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+# Состояние пула соединений
+@app.get("/{RESOURCE}/health/db")
+def database_health():
+    try:
+        with db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return {"status": "OK", "pool": db_pool.stats(), "read_routing": db_replicas.stats()}
+    except Exception as e:
+        raise database_error("Ошибка проверки базы данных", e)
 
 if __name__ == "__main__":
     print("Запуск Python Database API на порту 8000")
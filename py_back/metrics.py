@@ -0,0 +1,161 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Метрики горячего пути в текстовом формате Prometheus и заголовок Server-Timing.
+#
+# MetricsMiddleware заводит на каждый запрос словарь длительностей в ContextVar;
+# span() дописывает в него время участков (получение соединения, запрос к БД,
+# категоризация, сериализация). Синхронные эндпоинты Starlette выполняет в пуле
+# потоков с копией контекста, поэтому словарь запроса виден и там.
+
+# Границы корзин гистограмм, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Участки вне запроса (фоновые задачи) учитываются под этим маршрутом
+BACKGROUND_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Гистограмма с метками: на каждую комбинацию меток — счётчики корзин, сумма и количество"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики корзин..., сумма, количество]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Sequence[str], value: float):
+        labels = tuple(labels)
+        # Корзина, в которую попадает значение; кумулятивные суммы считаются при выводе
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                bucket_labels = _format_labels(self.label_names, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{label_text} {int(series[-1])}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса целиком",
+    ("method", "route", "status"),
+)
+span_duration = Histogram(
+    "http_request_span_duration_seconds",
+    "Время участков обработки запроса: db_acquire, db_query, db_fetch, categorize, serialize",
+    ("route", "span"),
+)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замеряет участок кода; повторные участки с тем же именем в одном запросе суммируются"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = _request_timings.get()
+        if timings is None:
+            span_duration.observe((BACKGROUND_ROUTE, name), elapsed)
+        else:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """Значение заголовка Server-Timing, длительности в миллисекундах"""
+    entries = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in list(timings.items())]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def render_gauge(name: str, help_text: str, value: float) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_number(value)}"]
+
+
+def render_metrics(extra_lines: Sequence[str] = ()) -> str:
+    lines = [*request_duration.render(), *span_duration.render(), *extra_lines]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время запроса по маршруту и статусу, участки запроса
+    в гистограммы и заголовок Server-Timing. Участки, завершившиеся после
+    отправки заголовков (потоковые ответы), попадают только в гистограммы.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total = time.perf_counter() - started
+            _request_timings.reset(token)
+            # Шаблон пути, а не сам путь: число рядов метрик не растёт с числом id
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            request_duration.observe((scope["method"], route_path, str(status)), total)
+            for name, elapsed in timings.items():
+                span_duration.observe((route_path, name), elapsed)
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from tree_snapshot import Snapshot, SnapshotError, is_snapshot, write_snapshot
+
+SNAPSHOT_KIND = "product_tree"
+# Колонки индекса; в снимке они лежат под теми же именами
+COLUMNS = ("ids", "parent", "depth", "end", "kind", "name", "id_order")
+
+
+class ProductTreeIndex:
+    """
+    Индекс дерева товаров (формат ProductTreeGenerator из itr2_DS.py).
+
+    Строится один раз обходом в глубину. Узлы лежат в колонках в порядке
+    прямого обхода, поэтому потомки узла занимают непрерывный отрезок
+    [позиция узла, end] (интервалы nested set / Эйлерова обхода):
+      - узел по id — O(1) через словарь id -> позиция
+        (у снимка — двоичный поиск по id_order);
+      - «X лежит под Y» — O(1) сравнением интервалов;
+      - все потомки — срез колонок, O(размер поддерева);
+      - путь до корня — по ссылкам на родителя, O(глубина).
+    Колонки — array.array или memoryview поверх снимка (from_snapshot).
+    """
+
+    def __init__(self, roots: Iterable[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None):
+        self.meta = dict(meta or {})
+        self.ids = array("q")
+        self.parent = array("i")
+        self.depth = array("i")
+        self.end = array("i")
+        self.kind = array("i")
+        self.name = array("i")
+        self.kinds: List[str] = []
+        self.strings: List[str] = []
+        self._position: Optional[Dict[int, int]] = {}
+        self._snapshot: Optional[Snapshot] = None
+        # sha1 JSON, из которого собран снимок (см. load_product_tree)
+        self.source_sha1: Optional[str] = None
+        kind_index: Dict[str, int] = {}
+        string_index: Dict[str, int] = {}
+
+        # Стек вместо рекурсии: глубина дерева не ограничена лимитом рекурсии
+        stack = [(node, -1, 0, False) for node in reversed(list(roots))]
+        while stack:
+            node, parent, depth, closing = stack.pop()
+            if closing:
+                self.end[parent] = len(self.ids) - 1
+                continue
+            node_id = node["id"]
+            if node_id in self._position:
+                raise ValueError(f"Повторяющийся id узла: {node_id}")
+            position = len(self.ids)
+            self._position[node_id] = position
+            self.ids.append(node_id)
+            self.parent.append(parent)
+            self.depth.append(depth)
+            self.end.append(position)
+            self.kind.append(kind_index.setdefault(node.get("type"), len(kind_index)))
+            self.name.append(string_index.setdefault(node["name"], len(string_index)))
+            children = node.get("children") or []
+            if children:
+                # Маркер закрытия снимается после всех потомков и фиксирует конец интервала
+                stack.append((None, position, depth, True))
+                stack.extend((child, position, depth + 1, False) for child in reversed(children))
+
+        self.kinds = list(kind_index)
+        self.strings = list(string_index)
+        self.id_order = array("i", sorted(range(len(self.ids)), key=self.ids.__getitem__))
+
+    @classmethod
+    def from_file(cls, path: str) -> "ProductTreeIndex":
+        """Загружает product_tree_*.json: объект с ключом categories или просто список корней"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return cls(data)
+        meta = {key: value for key, value in data.items() if key != "categories"}
+        return cls(data["categories"], meta)
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "ProductTreeIndex":
+        """Отображает снимок в память без разбора: колонки читаются прямо из mmap"""
+        snapshot = Snapshot(path, SNAPSHOT_KIND)
+        index = cls.__new__(cls)
+        for column in COLUMNS:
+            setattr(index, column, snapshot.columns[column])
+        index.meta = snapshot.meta["meta"]
+        index.kinds = snapshot.meta["kinds"]
+        index.source_sha1 = snapshot.meta.get("source_sha1")
+        index.strings = snapshot.strings
+        index._position = None
+        index._snapshot = snapshot
+        return index
+
+    def save_snapshot(self, path: str, source_sha1: Optional[str] = None):
+        write_snapshot(
+            path,
+            SNAPSHOT_KIND,
+            {column: getattr(self, column) for column in COLUMNS},
+            list(self.strings),
+            {"meta": self.meta, "kinds": self.kinds, "source_sha1": source_sha1},
+        )
+
+    def close(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: int) -> bool:
+        return self._find(node_id) is not None
+
+    def _find(self, node_id: int) -> Optional[int]:
+        if self._position is not None:
+            return self._position.get(node_id)
+        ids, order = self.ids, self.id_order
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if ids[order[middle]] < node_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and ids[order[low]] == node_id:
+            return order[low]
+        return None
+
+    def _pos(self, node_id: int) -> int:
+        position = self._find(node_id)
+        if position is None:
+            raise KeyError(f"Узел {node_id} не найден")
+        return position
+
+    def _children(self, position: int) -> Iterator[int]:
+        child = position + 1
+        while child <= self.end[position]:
+            yield child
+            child = self.end[child] + 1
+
+    def _roots(self) -> Iterator[int]:
+        position = 0
+        while position < len(self.ids):
+            yield position
+            position = self.end[position] + 1
+
+    def _describe(self, position: int) -> Dict[str, Any]:
+        parent = self.parent[position]
+        return {
+            "id": self.ids[position],
+            "name": self.strings[self.name[position]],
+            "type": self.kinds[self.kind[position]],
+            "parent_id": self.ids[parent] if parent >= 0 else None,
+            "depth": self.depth[position],
+            "children_count": sum(1 for _ in self._children(position)),
+            "descendants_count": self.end[position] - position,
+        }
+
+    def node(self, node_id: int) -> Dict[str, Any]:
+        return self._describe(self._pos(node_id))
+
+    def iter_nodes(self) -> Iterator[Dict[str, Any]]:
+        """Все узлы в порядке прямого обхода"""
+        return (self._describe(position) for position in range(len(self.ids)))
+
+    def roots(self) -> List[Dict[str, Any]]:
+        return [self._describe(position) for position in self._roots()]
+
+    def children(self, node_id: int) -> List[Dict[str, Any]]:
+        return [self._describe(position) for position in self._children(self._pos(node_id))]
+
+    def parent_node(self, node_id: int) -> Optional[Dict[str, Any]]:
+        parent = self.parent[self._pos(node_id)]
+        return self._describe(parent) if parent >= 0 else None
+
+    def path_to_root(self, node_id: int) -> List[Dict[str, Any]]:
+        """Цепочка от узла до корня включительно"""
+        path = []
+        position = self._pos(node_id)
+        while position >= 0:
+            path.append(self._describe(position))
+            position = self.parent[position]
+        return path
+
+    def is_descendant(self, node_id: int, ancestor_id: int) -> bool:
+        """True, если node_id лежит строго под ancestor_id"""
+        position = self._pos(node_id)
+        ancestor = self._pos(ancestor_id)
+        return ancestor < position <= self.end[ancestor]
+
+    def _kind_index(self, node_type: str) -> int:
+        return self.kinds.index(node_type) if node_type in self.kinds else -1
+
+    def descendant_count(self, node_id: int, node_type: Optional[str] = None) -> int:
+        position = self._pos(node_id)
+        if node_type is None:
+            return self.end[position] - position
+        kind = self._kind_index(node_type)
+        return sum(1 for child in range(position + 1, self.end[position] + 1) if self.kind[child] == kind)
+
+    def descendants(
+        self,
+        node_id: int,
+        node_type: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Потомки в порядке прямого обхода; node_type оставляет только узлы этого типа"""
+        position = self._pos(node_id)
+        kind = None if node_type is None else self._kind_index(node_type)
+        result = []
+        skipped = 0
+        for child in range(position + 1, self.end[position] + 1):
+            if kind is not None and self.kind[child] != kind:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self._describe(child))
+        return result
+
+    def interval(self, node_id: int) -> Dict[str, int]:
+        """Интервал nested set: left — позиция в прямом обходе, right — позиция последнего потомка"""
+        position = self._pos(node_id)
+        return {"left": position, "right": self.end[position]}
+
+    def stats(self) -> Dict[str, Any]:
+        counts = [0] * len(self.kinds)
+        for kind in self.kind:
+            counts[kind] += 1
+        return {
+            **self.meta,
+            "nodes": len(self.ids),
+            "roots": sum(1 for _ in self._roots()),
+            "levels": max(self.depth, default=-1) + 1,
+            "types": dict(zip(self.kinds, counts)),
+            "snapshot": self._snapshot is not None,
+        }
+
+
+def snapshot_path_for(path: str) -> str:
+    """Снимок рядом с JSON: product_tree.json -> product_tree.snap"""
+    return os.path.splitext(path)[0] + ".snap"
+
+
+def file_sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_product_tree(path: str, snapshot_path: Optional[str] = None) -> ProductTreeIndex:
+    """
+    Снимок (tree_snapshot) отображается в память, JSON разбирается и индексируется.
+
+    С snapshot_path источником остаётся JSON, а снимок — его кэшем: снимок
+    берётся, только если собран из текущего содержимого JSON (sha1 в заголовке
+    снимка), иначе JSON разбирается заново и снимок перезаписывается.
+    """
+    if is_snapshot(path):
+        return ProductTreeIndex.from_snapshot(path)
+    if snapshot_path is None:
+        return ProductTreeIndex.from_file(path)
+
+    source_sha1 = file_sha1(path)
+    try:
+        index = ProductTreeIndex.from_snapshot(snapshot_path)
+    except (OSError, SnapshotError):
+        # Снимка нет или он другой версии формата — собирается заново
+        index = None
+    if index is not None:
+        if index.source_sha1 == source_sha1:
+            return index
+        index.close()
+    index = ProductTreeIndex.from_file(path)
+    try:
+        index.save_snapshot(snapshot_path, source_sha1)
+    except OSError:
+        # Каталог только на чтение — работаем с разобранным JSON без снимка
+        return index
+    return ProductTreeIndex.from_snapshot(snapshot_path)
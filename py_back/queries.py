@@ -0,0 +1,63 @@
+from db import PreparedQuery
+
+# Фиксированный набор горячих запросов к fridge_items (см. db.PreparedQuery).
+#
+# Вместо * — явный список столбцов, которые отдаёт API: ответ не растёт от
+# новых служебных столбцов, а подготовленный план не ломается после ALTER TABLE
+# ("cached plan must not change result type").
+
+ITEM_COLUMNS = "id, name, is_in_fridge, created_at, category"
+
+
+def _database_items(name: str, keyset: bool, limit: bool) -> PreparedQuery:
+    query = f"SELECT {ITEM_COLUMNS} FROM fridge_items "
+    if keyset:
+        query += "WHERE (created_at, id) < (%s, %s) "
+    query += "ORDER BY created_at DESC, id DESC"
+    if limit:
+        query += " LIMIT %s"
+    return PreparedQuery(name, query)
+
+
+# Список товаров по индексу (created_at DESC, id DESC): ключ — (есть курсор keyset-пагинации, есть LIMIT)
+DATABASE_ITEMS = {
+    (False, False): _database_items("fridge_items_all", keyset=False, limit=False),
+    (False, True): _database_items("fridge_items_page", keyset=False, limit=True),
+    (True, False): _database_items("fridge_items_after", keyset=True, limit=False),
+    (True, True): _database_items("fridge_items_page_after", keyset=True, limit=True),
+}
+
+ITEMS_BY_CATEGORY = PreparedQuery(
+    "fridge_items_by_category",
+    f"SELECT {ITEM_COLUMNS} FROM fridge_items WHERE category = ANY(%s) ORDER BY created_at DESC",
+)
+
+ADD_ITEM = PreparedQuery(
+    "fridge_items_add",
+    f"INSERT INTO fridge_items (name, is_in_fridge, category) VALUES (%s, %s, %s) RETURNING {ITEM_COLUMNS}",
+)
+
+TOGGLE_ITEM = PreparedQuery(
+    "fridge_items_toggle",
+    f"UPDATE fridge_items SET is_in_fridge = NOT is_in_fridge WHERE id = %s RETURNING {ITEM_COLUMNS}",
+)
+
+DELETE_ITEM = PreparedQuery(
+    "fridge_items_delete",
+    f"DELETE FROM fridge_items WHERE id = %s RETURNING {ITEM_COLUMNS}",
+)
+
+BULK_TOGGLE_ITEMS = PreparedQuery(
+    "fridge_items_bulk_toggle",
+    f"UPDATE fridge_items SET is_in_fridge = NOT is_in_fridge WHERE id = ANY(%s) RETURNING {ITEM_COLUMNS}",
+)
+
+BULK_DELETE_ITEMS = PreparedQuery(
+    "fridge_items_bulk_delete",
+    f"DELETE FROM fridge_items WHERE id = ANY(%s) RETURNING {ITEM_COLUMNS}",
+)
+
+CATEGORY_STATISTICS = PreparedQuery(
+    "category_statistics",
+    "SELECT category, total, in_fridge FROM category_stats WHERE total > 0 ORDER BY category",
+)
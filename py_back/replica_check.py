@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка маршрутизации чтений на двух локальных PostgreSQL: primary и потоковой реплике.
+
+Берёт те же переменные окружения, что и API (DB_*, DB_REPLICAS, DB_REPLICA_MAX_LAG).
+Проверяет, что реплика в ротации и чтения уходят на неё, что свежее чтение
+(fresh=True) сразу после записи видит её, и меряет, через сколько запись
+становится видна на реплике.
+Затем, если указан --stop_hint, просит остановить реплику и проверяет, что чтения
+переключаются на primary.
+
+Пример (реплика на порту 5433, см. README):
+    DB_REPLICAS=localhost:5433 python replica_check.py
+"""
+import argparse
+import sys
+import time
+
+from db import db_pool, db_replicas
+
+
+def read_source(fresh=False):
+    """Откуда пришло чтение: реплика (pg_is_in_recovery) или primary"""
+    with db_replicas.read_connection(fresh) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_is_in_recovery()")
+        return "replica" if cursor.fetchone()[0] else "primary"
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--reads", type=int, default=20, help="Сколько чтений на каждом шаге")
+    p.add_argument("--timeout", type=float, default=10.0, help="Сколько секунд ждать появления записи на реплике")
+    p.add_argument("--stop_hint", action="store_true", help="Проверить переключение на primary при остановке реплики")
+    args = p.parse_args()
+
+    if not db_replicas.enabled:
+        sys.exit("Реплики не заданы: укажите DB_REPLICAS=host:port")
+    db_pool.open()
+    try:
+        db_replicas.check_replicas()
+        for replica in db_replicas.stats()["replicas"]:
+            print(f"{replica['name']}: отставание {replica['lag']}, в ротации {replica['in_rotation']}, ошибка {replica['error']}")
+
+        sources = [read_source() for _ in range(args.reads)]
+        print(f"Чтения: реплика x{sources.count('replica')}, primary x{sources.count('primary')}")
+
+        with db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("INSERT INTO fridge_items (name, is_in_fridge) VALUES (%s, true) RETURNING id", ("Проверка реплики",))
+            item_id = cursor.fetchone()[0]
+            conn.commit()
+        with db_replicas.read_connection(fresh=True) as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT pg_is_in_recovery(), EXISTS (SELECT 1 FROM fridge_items WHERE id = %s)", (item_id,))
+            in_recovery, visible = cursor.fetchone()
+        print(f"Свежее чтение сразу после записи: {'реплика' if in_recovery else 'primary'}, запись видна: {visible}")
+
+        started = time.monotonic()
+        visible_after = None
+        replica = db_replicas.replicas[0]
+        while time.monotonic() - started < args.timeout:
+            with replica.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM fridge_items WHERE id = %s", (item_id,))
+                if cursor.fetchone():
+                    visible_after = time.monotonic() - started
+                    break
+            time.sleep(0.01)
+        print(f"Запись видна на {replica.name} через {visible_after * 1000:.1f} мс" if visible_after is not None
+              else f"Запись не появилась на {replica.name} за {args.timeout} с")
+
+        with db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM fridge_items WHERE id = %s", (item_id,))
+            conn.commit()
+
+        if args.stop_hint:
+            input("Остановите реплику (pg_ctl -D ... stop) и нажмите Enter ")
+            db_replicas.check_replicas()
+            sources = [read_source() for _ in range(args.reads)]
+            print(f"Без реплики: реплика x{sources.count('replica')}, primary x{sources.count('primary')}, "
+                  f"переключений {db_replicas.stats()['fallbacks']}")
+    finally:
+        db_replicas.close()
+        db_pool.close()
+
+
+if __name__ == "__main__":
+    main()
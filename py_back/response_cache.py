@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from categorizer import LRUCache
+
+try:
+    import redis
+except ImportError:  # redis нужен только для общего кэша нескольких процессов (RESPONSE_CACHE_URL)
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Тело ответа и его ETag
+CacheEntry = Tuple[bytes, str]
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag: меняется тогда и только тогда, когда меняются байты ответа"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое по RFC 9110: W/"x" совпадает с "x"
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag == etag or tag == "W/" + etag for tag in candidates)
+
+
+class LocalCacheBackend:
+    """
+    Кэш в памяти процесса: LRU по числу записей и счётчик версии данных.
+    Записи живут не дольше ttl секунд — страховка на случай изменения,
+    о котором процесс не узнал (например, лента изменений была отключена)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = LRUCache(maxsize)
+        self._ttl = ttl
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        with self._lock:
+            self._version += 1
+            # Записи старых версий больше не запрашиваются — освобождаем память сразу
+            self._entries = LRUCache(self._entries.maxsize)
+            return self._version
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        stored = self._entries.get(key)
+        if stored is None or stored[0] < time.monotonic():
+            return None
+        return stored[1]
+
+    def put(self, key: str, entry: CacheEntry):
+        self._entries.put(key, (time.monotonic() + self._ttl, entry))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "ttl": self._ttl, **self._entries.stats()}
+
+
+class RedisCacheBackend:
+    """
+    Общий кэш для всех воркеров: версия — счётчик INCR, записи — ключи с TTL.
+    Записи старых версий никто не читает, они истекают сами.
+    """
+
+    def __init__(self, url: str, ttl: int, prefix: str = "response_cache"):
+        if redis is None:
+            raise RuntimeError("Для RESPONSE_CACHE_URL нужен пакет redis: pip install redis")
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl
+        self._prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def version(self) -> int:
+        return int(self._client.get(f"{self._prefix}:version") or 0)
+
+    def bump(self) -> int:
+        return int(self._client.incr(f"{self._prefix}:version"))
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raw = self._client.get(f"{self._prefix}:{key}")
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, _, body = raw.partition(b"\n")
+        return body, etag.decode("ascii")
+
+    def put(self, key: str, entry: CacheEntry):
+        body, etag = entry
+        self._client.set(f"{self._prefix}:{key}", etag.encode("ascii") + b"\n" + body, ex=self._ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    Кэш готовых JSON-ответов читающих эндпоинтов.
+
+    Ключ — эндпоинт, параметры и текущая версия данных. Изменяющие эндпоинты
+    и лента изменений (NOTIFY на любое изменение fridge_items, в том числе мимо
+    API) вызывают bump(): версия растёт, и следующие чтения идут мимо старых записей.
+    Версию нужно взять до чтения из БД (key()), тогда ответ, посчитанный
+    параллельно с изменением, ляжет под старую версию и никому не достанется.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def shared(self) -> bool:
+        """Общий для всех процессов кэш: его сбрасывает bump() любого из них"""
+        return isinstance(self.backend, RedisCacheBackend)
+
+    def key(self, endpoint: str, params: Dict[str, Any]) -> str:
+        encoded = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+        return f"{endpoint}:{self.backend.version()}:{encoded}"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.backend.get(key)
+
+    def put(self, key: str, body: bytes) -> CacheEntry:
+        entry = (body, make_etag(body))
+        self.backend.put(key, entry)
+        return entry
+
+    def bump(self):
+        if self.backend is None:
+            return
+        try:
+            self.backend.bump()
+        except Exception as e:
+            # Изменение уже закоммичено; общий кэш догонит его по TTL записей
+            logger.warning("Не удалось сбросить кэш ответов: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.backend is None:
+            return {"enabled": False}
+        return {"enabled": True, "version": self.backend.version(), **self.backend.stats()}
+
+
+def response_cache_from_env(environ) -> ResponseCache:
+    """
+    RESPONSE_CACHE_URL — общий кэш в Redis, иначе локальный на RESPONSE_CACHE_SIZE записей (0 — выключен);
+    RESPONSE_CACHE_TTL — время жизни записи в обоих случаях
+    """
+    url = environ.get("RESPONSE_CACHE_URL")
+    ttl = int(environ.get("RESPONSE_CACHE_TTL", 60))
+    if url:
+        return ResponseCache(RedisCacheBackend(url, ttl))
+    size = int(environ.get("RESPONSE_CACHE_SIZE", 256))
+    return ResponseCache(LocalCacheBackend(size, ttl) if size > 0 else None)
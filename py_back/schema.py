@@ -0,0 +1,372 @@
+import logging
+from typing import Callable
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from db import PreparedQuery
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Счётчики /statistics по категориям. Поддерживаются триггерами уровня оператора
+# с таблицами переходов: пакетная вставка даёт один upsert на категорию, а не на строку.
+# Строки без категории временно учитываются под ключом ''.
+CATEGORY_STATS_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category VARCHAR(64) PRIMARY KEY,
+        total BIGINT NOT NULL DEFAULT 0,
+        in_fridge BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    # ORDER BY в upsert — одинаковый порядок блокировок строк счётчиков у параллельных транзакций
+    """
+    CREATE OR REPLACE FUNCTION category_stats_on_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO category_stats AS s (category, total, in_fridge)
+        SELECT category, SUM(total), SUM(in_fridge) FROM (
+            SELECT COALESCE(category, '') AS category, 1 AS total, COALESCE(is_in_fridge::int, 0) AS in_fridge
+            FROM new_rows
+        ) AS deltas
+        GROUP BY category
+        HAVING SUM(total) <> 0 OR SUM(in_fridge) <> 0
+        ORDER BY category
+        ON CONFLICT (category) DO UPDATE
+            SET total = s.total + EXCLUDED.total,
+                in_fridge = s.in_fridge + EXCLUDED.in_fridge;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_on_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO category_stats AS s (category, total, in_fridge)
+        SELECT category, SUM(total), SUM(in_fridge) FROM (
+            SELECT COALESCE(category, '') AS category, -1 AS total, -COALESCE(is_in_fridge::int, 0) AS in_fridge
+            FROM old_rows
+        ) AS deltas
+        GROUP BY category
+        HAVING SUM(total) <> 0 OR SUM(in_fridge) <> 0
+        ORDER BY category
+        ON CONFLICT (category) DO UPDATE
+            SET total = s.total + EXCLUDED.total,
+                in_fridge = s.in_fridge + EXCLUDED.in_fridge;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_on_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO category_stats AS s (category, total, in_fridge)
+        SELECT category, SUM(total), SUM(in_fridge) FROM (
+            SELECT COALESCE(category, '') AS category, 1 AS total, COALESCE(is_in_fridge::int, 0) AS in_fridge
+            FROM new_rows
+            UNION ALL
+            SELECT COALESCE(category, '') AS category, -1 AS total, -COALESCE(is_in_fridge::int, 0) AS in_fridge
+            FROM old_rows
+        ) AS deltas
+        GROUP BY category
+        HAVING SUM(total) <> 0 OR SUM(in_fridge) <> 0
+        ORDER BY category
+        ON CONFLICT (category) DO UPDATE
+            SET total = s.total + EXCLUDED.total,
+                in_fridge = s.in_fridge + EXCLUDED.in_fridge;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_on_truncate() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM category_stats;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS category_stats_insert ON fridge_items",
+    "DROP TRIGGER IF EXISTS category_stats_delete ON fridge_items",
+    "DROP TRIGGER IF EXISTS category_stats_update ON fridge_items",
+    "DROP TRIGGER IF EXISTS category_stats_truncate ON fridge_items",
+    """
+    CREATE TRIGGER category_stats_insert AFTER INSERT ON fridge_items
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION category_stats_on_insert()
+    """,
+    """
+    CREATE TRIGGER category_stats_delete AFTER DELETE ON fridge_items
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION category_stats_on_delete()
+    """,
+    """
+    CREATE TRIGGER category_stats_update AFTER UPDATE ON fridge_items
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION category_stats_on_update()
+    """,
+    """
+    CREATE TRIGGER category_stats_truncate AFTER TRUNCATE ON fridge_items
+        FOR EACH STATEMENT EXECUTE FUNCTION category_stats_on_truncate()
+    """,
+]
+
+# Лента изменений (change_feed.py): каждая вставка, удаление, перемещение, переименование
+# или смена категории товара уходит в NOTIFY готовым JSON. По этим же событиям каждый процесс
+# API сбрасывает свой кэш ответов, поэтому изменения мимо API (psql, Node-бэкенд, пересчёт
+# категорий) тоже его сбрасывают.
+CHANGE_NOTIFY_STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION fridge_items_notify_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('fridge_items_changes', json_build_object('type', 'resync')::text);
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('fridge_items_changes', json_build_object('type', 'delete', 'item', row_to_json(OLD))::text);
+        ELSE
+            PERFORM pg_notify('fridge_items_changes', json_build_object('type', lower(TG_OP), 'item', row_to_json(NEW))::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS fridge_items_notify_insert_delete ON fridge_items",
+    "DROP TRIGGER IF EXISTS fridge_items_notify_update ON fridge_items",
+    "DROP TRIGGER IF EXISTS fridge_items_notify_truncate ON fridge_items",
+    """
+    CREATE TRIGGER fridge_items_notify_insert_delete AFTER INSERT OR DELETE ON fridge_items
+        FOR EACH ROW EXECUTE FUNCTION fridge_items_notify_change()
+    """,
+    """
+    CREATE TRIGGER fridge_items_notify_update AFTER UPDATE OF is_in_fridge, name, category ON fridge_items
+        FOR EACH ROW
+        WHEN (OLD.is_in_fridge IS DISTINCT FROM NEW.is_in_fridge OR OLD.name IS DISTINCT FROM NEW.name
+              OR OLD.category IS DISTINCT FROM NEW.category)
+        EXECUTE FUNCTION fridge_items_notify_change()
+    """,
+    """
+    CREATE TRIGGER fridge_items_notify_truncate AFTER TRUNCATE ON fridge_items
+        FOR EACH STATEMENT EXECUTE FUNCTION fridge_items_notify_change()
+    """,
+]
+
+# Полный пересчёт тех же счётчиков по fridge_items
+CATEGORY_STATS_RECOMPUTE = (
+    "SELECT COALESCE(category, '') AS category, COUNT(*) AS total, "
+    "COUNT(*) FILTER (WHERE is_in_fridge) AS in_fridge "
+    "FROM fridge_items GROUP BY 1"
+)
+
+# Схема таблицы совпадает с backend/server.js; остальное — идемпотентные миграции
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS fridge_items (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        is_in_fridge BOOLEAN DEFAULT true,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Порядок выдачи /database-items и keyset-пагинация
+    "CREATE INDEX IF NOT EXISTS fridge_items_created_at_id_idx ON fridge_items (created_at DESC, id DESC)",
+    # Категория считается в Python (categorize_product) и хранится рядом с товаром
+    "ALTER TABLE fridge_items ADD COLUMN IF NOT EXISTS category VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS fridge_items_category_idx ON fridge_items (category, created_at DESC)",
+    # Строки без категории (вставленные мимо API или переименованные) находятся без скана таблицы
+    "CREATE INDEX IF NOT EXISTS fridge_items_category_missing_idx ON fridge_items (id) WHERE category IS NULL",
+    # Версия словаря, по которой посчитаны сохранённые категории
+    """
+    CREATE TABLE IF NOT EXISTS category_dictionary (
+        singleton BOOLEAN PRIMARY KEY DEFAULT true CHECK (singleton),
+        version TEXT NOT NULL
+    )
+    """,
+    # Переименование мимо API сбрасывает категорию, чтобы её пересчитали
+    """
+    CREATE OR REPLACE FUNCTION fridge_items_reset_category() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.name IS DISTINCT FROM OLD.name AND NEW.category IS NOT DISTINCT FROM OLD.category THEN
+            NEW.category := NULL;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS fridge_items_reset_category ON fridge_items",
+    """
+    CREATE TRIGGER fridge_items_reset_category
+        BEFORE UPDATE OF name ON fridge_items
+        FOR EACH ROW EXECUTE FUNCTION fridge_items_reset_category()
+    """,
+    *CATEGORY_STATS_STATEMENTS,
+    *CHANGE_NOTIFY_STATEMENTS,
+]
+
+# Триграммный индекс для поиска по подстроке и нечёткого поиска по названию
+TRIGRAM_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS fridge_items_name_trgm_idx ON fridge_items USING gin (lower(name) gin_trgm_ops)",
+]
+
+BATCH_SIZE = 1000
+# Ключи pg_advisory_xact_lock: несколько воркеров, стартующих одновременно,
+# создают схему и пересчитывают категории по очереди, а не наперегонки
+SCHEMA_LOCK_ID = 7_201_001
+CATEGORY_SYNC_LOCK_ID = 7_201_002
+
+
+def ensure_schema(conn):
+    """Создаёт таблицы, колонку category, индексы и триггеры, если их ещё нет"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+        cursor.execute("SELECT to_regclass('category_stats') IS NULL")
+        stats_missing = cursor.fetchone()[0]
+        for statement in SCHEMA_STATEMENTS:
+            cursor.execute(statement)
+        if stats_missing:
+            rebuild_category_stats(cursor)
+    conn.commit()
+
+
+def ensure_trigram_search(conn) -> bool:
+    """
+    Подключает pg_trgm и строит GIN-индекс по lower(name).
+    Без прав на CREATE EXTENSION возвращает False — поиск тогда работает без индекса.
+    """
+    try:
+        with conn.cursor() as cursor:
+            for statement in TRIGRAM_STATEMENTS:
+                cursor.execute(statement)
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.warning("Не удалось включить pg_trgm: %s", e)
+        return False
+
+
+def rebuild_category_stats(cursor):
+    """Пересчитывает category_stats с нуля; запись в fridge_items блокируется до конца транзакции"""
+    cursor.execute("LOCK TABLE fridge_items IN SHARE MODE")
+    cursor.execute("DELETE FROM category_stats")
+    cursor.execute("INSERT INTO category_stats (category, total, in_fridge) " + CATEGORY_STATS_RECOMPUTE)
+
+
+def check_category_stats(cursor):
+    """
+    Сравнивает счётчики с полным пересчётом. Обе выборки делаются одним запросом,
+    то есть по одному снимку данных. Возвращает список расхождений.
+    """
+    cursor.execute(
+        "SELECT category, s.total AS stored_total, s.in_fridge AS stored_in_fridge, "
+        "r.total AS actual_total, r.in_fridge AS actual_in_fridge "
+        "FROM (SELECT * FROM category_stats WHERE total <> 0 OR in_fridge <> 0) AS s "
+        "FULL JOIN (" + CATEGORY_STATS_RECOMPUTE + ") AS r USING (category) "
+        "WHERE s.total IS DISTINCT FROM r.total OR s.in_fridge IS DISTINCT FROM r.in_fridge "
+        "ORDER BY category"
+    )
+    return cursor.fetchall()
+
+
+def _update_categories(cursor, rows, categorize: Callable[[str], str]) -> int:
+    with span("categorize"):
+        values = [(row[0], categorize(row[1])) for row in rows]
+    if not values:
+        return 0
+    # Переписываются только строки, чья категория изменилась: смена словаря не трогает остальные
+    execute_values(
+        cursor,
+        "UPDATE fridge_items AS f SET category = v.category "
+        "FROM (VALUES %s) AS v(id, category) WHERE f.id = v.id AND f.category IS DISTINCT FROM v.category",
+        values,
+        page_size=len(values),
+    )
+    return cursor.rowcount
+
+
+# Записанная версия словаря под разделяемой блокировкой строки (до конца транзакции):
+# пока sync_categories пересчитывает таблицу и держит строку FOR UPDATE, запрос ждёт
+# и после коммита пересчёта видит уже новую версию
+CURRENT_DICTIONARY = PreparedQuery(
+    "category_dictionary_current",
+    "SELECT version = %s FROM category_dictionary FOR SHARE",
+)
+
+
+def dictionary_is_current(conn, version: str) -> bool:
+    """
+    Совпадает ли version с версией словаря, по которой посчитаны категории в БД.
+
+    Категорию, посчитанную по другой версии, писать нельзя: воркер, ещё не
+    перечитавший дерево, иначе оставил бы в таблице категории старого словаря
+    уже после пересчёта. Такие строки пишутся с category = NULL и досчитываются
+    воркером с актуальным словарём. Блокировка держится до конца транзакции —
+    запись нужно сделать в ней же.
+    """
+    with conn.cursor() as cursor:
+        CURRENT_DICTIONARY.execute(cursor, (version,))
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+# Проверяется перед каждым чтением по категориям, поэтому подготавливается
+HAS_MISSING_CATEGORIES = PreparedQuery(
+    "fridge_items_has_missing_categories",
+    "SELECT EXISTS (SELECT 1 FROM fridge_items WHERE category IS NULL)",
+)
+
+
+def has_missing_categories(cursor) -> bool:
+    """Есть ли строки с category IS NULL; работает и на реплике"""
+    HAS_MISSING_CATEGORIES.execute(cursor)
+    return cursor.fetchone()[0]
+
+
+def fill_missing_categories(cursor, categorize: Callable[[str], str]) -> int:
+    """Досчитывает категории строк с category IS NULL (частичный индекс, обычно 0 строк)"""
+    cursor.execute("SELECT id, name FROM fridge_items WHERE category IS NULL")
+    return _update_categories(cursor, cursor.fetchall(), categorize)
+
+
+def sync_categories(conn, categorize: Callable[[str], str], version: str) -> int:
+    """
+    Приводит сохранённые категории к текущему словарю.
+
+    Если версия словаря в БД совпадает с version, досчитываются только
+    строки без категории; иначе пересчитывается вся таблица пачками.
+    Возвращает число обновлённых строк.
+
+    Строка версии держится FOR UPDATE до коммита: записи с категорией
+    (dictionary_is_current) ждут пересчёт и либо попадают в него, либо
+    видят уже новую версию.
+    """
+    with conn.cursor() as cursor:
+        # Кто ждал блокировку, увидит уже записанную версию и досчитает только пустые категории
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CATEGORY_SYNC_LOCK_ID,))
+        cursor.execute("SELECT version FROM category_dictionary FOR UPDATE")
+        row = cursor.fetchone()
+        if row and row[0] == version:
+            updated = fill_missing_categories(cursor, categorize)
+            conn.commit()
+            return updated
+
+        updated = 0
+        last_id = 0
+        while True:
+            cursor.execute(
+                "SELECT id, name FROM fridge_items WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, BATCH_SIZE),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updated += _update_categories(cursor, rows, categorize)
+            last_id = rows[-1][0]
+
+        cursor.execute(
+            "INSERT INTO category_dictionary (singleton, version) VALUES (true, %s) "
+            "ON CONFLICT (singleton) DO UPDATE SET version = EXCLUDED.version",
+            (version,),
+        )
+    conn.commit()
+    return updated
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Боевой запуск API: gunicorn-мастер и N воркеров uvicorn на одном порту.
+
+Мастер один раз загружает дерево товаров, строит автомат категоризации и
+готовит схему БД (main.preload), затем делает gc.freeze() и форкает воркеров:
+индексы достаются им через copy-on-write, а снимок дерева (.snap) — через общий
+page cache. Пул соединений, лента изменений и поток логов у каждого воркера свои
+и открываются уже после fork (lifespan).
+
+Кэш ответов без RESPONSE_CACHE_URL у каждого воркера свой: чужие изменения он
+узнаёт из ленты изменений (LISTEN/NOTIFY) и не используется, пока она не подключена.
+Клиент с кукой fresh_reads (только что писал) читает мимо него и видит свою запись.
+Метрики /metrics тоже у каждого воркера свои, и запрос к общему порту попадает
+к одному из них: для полной картины запускайте по воркеру на порт (--workers 1)
+и опрашивайте каждый порт, либо смотрите request-метрики на стороне nginx.
+
+Сигналы мастеру:
+    HUP        — плавная замена воркеров (новые пулы, тот же код);
+    USR2, затем WINCH и TERM старому мастеру — выкладка нового кода без простоя;
+    TTIN / TTOU — добавить / убрать воркера;
+    TERM       — плавная остановка: воркеры дорабатывают запросы graceful_timeout секунд.
+
+Пример:
+    python serve.py --workers 4 --bind 127.0.0.1:8000
+"""
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+class ApiServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # С preload_app вызывается в мастере один раз, до запуска воркеров
+        import main
+
+        main.preload()
+        # Объекты, созданные при загрузке, больше не трогает сборщик мусора:
+        # он не пишет в их заголовки, и страницы остаются общими с мастером
+        gc.freeze()
+        return main.app
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--bind", default=os.getenv("BIND", "127.0.0.1:8000"), help="Адрес и порт")
+    p.add_argument("--workers", type=int, default=default_workers(), help="Число воркеров (по умолчанию WEB_CONCURRENCY или число ядер)")
+    p.add_argument("--timeout", type=int, default=30, help="Воркер, не ответивший мастеру за столько секунд (в т.ч. при старте), перезапускается")
+    p.add_argument("--graceful_timeout", type=int, default=30, help="Сколько секунд воркер дорабатывает запросы при остановке")
+    p.add_argument("--max_requests", type=int, default=0, help="Перезапуск воркера после стольких запросов (0 — никогда)")
+    p.add_argument("--keepalive", type=int, default=5, help="Keep-alive соединений с nginx, секунд")
+    args = p.parse_args()
+
+    ApiServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        # Разброс, чтобы воркеры не перезапускались одновременно
+        "max_requests_jitter": args.max_requests // 10,
+        "keepalive": args.keepalive,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка атомарности toggle/remove под конкурентной нагрузкой.
+
+Создаёт товар, много раз параллельно переключает его из нескольких клиентов
+и проверяет, что ни одно обновление не потерялось: итоговое is_in_fridge
+должно совпасть с чётностью числа успешных переключений. Затем удаляет
+товар из всех клиентов сразу — ровно один DELETE должен вернуть 200.
+
+Пример (API должен быть запущен):
+    python stress_toggle.py --base_url http://127.0.0.1:8000/api --clients 32 --toggles 2000
+"""
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def request(method, url, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--base_url", type=str, default="http://127.0.0.1:8000/api", help="Адрес API")
+    p.add_argument("--clients", type=int, default=32, help="Сколько параллельных клиентов")
+    p.add_argument("--toggles", type=int, default=2000, help="Сколько переключений всего")
+    args = p.parse_args()
+
+    status, item = request("POST", f"{args.base_url}/items/add", {"name": "Стресс-тест toggle", "isInFridge": True})
+    if status != 200:
+        sys.exit(f"Не удалось создать товар: HTTP {status}")
+    item_id = item["id"]
+    toggle_url = f"{args.base_url}/items/move/{item_id}/toggle"
+
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        statuses = list(executor.map(lambda _: request("PATCH", toggle_url)[0], range(args.toggles)))
+    succeeded = statuses.count(200)
+    failed = len(statuses) - succeeded
+
+    _, items = request("GET", f"{args.base_url}/database-items")
+    final_state = next(entry["is_in_fridge"] for entry in items if entry["id"] == item_id)
+    expected_state = succeeded % 2 == 0
+    print(f"Переключений: {succeeded} успешных, {failed} с ошибкой; "
+          f"is_in_fridge={final_state}, ожидалось {expected_state}")
+
+    remove_url = f"{args.base_url}/items/remove/{item_id}"
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        remove_statuses = list(executor.map(lambda _: request("DELETE", remove_url)[0], range(args.clients)))
+    print(f"Удаление из {args.clients} клиентов: 200 x{remove_statuses.count(200)}, "
+          f"404 x{remove_statuses.count(404)}")
+
+    problems = []
+    if final_state != expected_state:
+        problems.append("потеряны обновления toggle")
+    if remove_statuses.count(200) != 1 or remove_statuses.count(404) != args.clients - 1:
+        problems.append("удаление не атомарно")
+    if problems:
+        sys.exit("ОШИБКА: " + ", ".join(problems))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
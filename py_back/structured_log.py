@@ -0,0 +1,161 @@
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Tuple
+
+# Неблокирующее структурированное логирование.
+#
+# Обработчик запроса только кладёт запись в ограниченную очередь (QueueHandler);
+# форматирование в JSON и запись в stdout делает отдельный поток QueueListener.
+# Перед очередью стоит фильтр: сообщения горячего пути (extra=HOT_PATH) сэмплируются,
+# а каждый шаблон сообщения ограничен token bucket'ом, так что шторм ошибок
+# не забивает ни очередь, ни stdout. Переполненная очередь отбрасывает записи, а не ждёт.
+
+# Помечает сводки, которые пишутся на каждый запрос: их достаточно видеть выборочно
+HOT_PATH = {"hot_path": True}
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "hot_path"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON; поля из extra попадают в запись как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Сэмплирование и ограничение частоты до постановки в очередь.
+
+    Записи с extra=HOT_PATH пропускаются с вероятностью sample_rate. Каждый
+    шаблон сообщения (logger, уровень, msg до подстановки аргументов) получает
+    rate записей в секунду с запасом burst; о подавленных записях сообщает
+    поле suppressed следующей пропущенной записи того же шаблона.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate: float = 10.0, burst: int = 50):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate = rate
+        self.burst = burst
+        # шаблон -> [токены, время последнего пополнения, подавлено с последней записи]
+        self._buckets: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "hot_path", False) and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        if self.rate <= 0:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1.0
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при полной очереди отбрасывает запись вместо ошибки"""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # В отличие от QueueHandler.prepare, JSON собирается в потоке записи;
+        # здесь только подставляются аргументы, чтобы не держать ссылки на них.
+        # Меняется копия: исходную запись могут обрабатывать другие обработчики
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Очередь, фильтр и поток записи; stop() дописывает всё, что успело попасть в очередь"""
+
+    def __init__(self, level: str = "INFO", queue_size: int = 10000, sample_rate: float = 1.0,
+                 rate: float = 10.0, burst: int = 50, stream=None):
+        self.filter = HotPathFilter(sample_rate, rate, burst)
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(self.filter)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.handler.queue, output, respect_handler_level=False)
+        self.level = level
+
+    def start(self):
+        root = logging.getLogger()
+        root.setLevel(self.level)
+        root.addHandler(self.handler)
+        self.listener.start()
+
+    def stop(self):
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.filter.sampled_out,
+            "suppressed": self.filter.suppressed,
+        }
+
+
+def log_pipeline_from_env(environ) -> LogPipeline:
+    """
+    LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE (доля сообщений горячего пути),
+    LOG_RATE и LOG_BURST (записей в секунду на шаблон, 0 — без ограничения)
+    """
+    return LogPipeline(
+        level=environ.get("LOG_LEVEL", "INFO").upper(),
+        queue_size=int(environ.get("LOG_QUEUE_SIZE", 10000)),
+        sample_rate=float(environ.get("LOG_SAMPLE_RATE", 0.01)),
+        rate=float(environ.get("LOG_RATE", 10)),
+        burst=int(environ.get("LOG_BURST", 50)),
+    )
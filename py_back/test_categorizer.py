@@ -0,0 +1,111 @@
+import os
+import random
+
+import pytest
+
+from categorizer import DEFAULT_CATEGORY, PRODUCT_CATEGORIES, Categorizer, CategoryMatcher, CategoryTree, categorize_naive
+from product_tree import load_product_tree
+
+PRODUCT_TREE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_tree_samara.json")
+
+# Категории товаров из "DB(tree-like).txt" по дереву product_tree_samara.json
+# (уровень subcategory) с запасным словарём PRODUCT_CATEGORIES
+EXPECTED_SUBCATEGORIES = {
+    "Молоко": "Молочные продукты",
+    "Сыр": "Молочные продукты",
+    "Йогурт": "Молочные продукты",
+    "Кефир": "Молочные продукты",
+    "Творог": "Молочные продукты",
+    "Сметана": "Молочные продукты",
+    "Сливочное масло": "Молочные продукты",
+    "Помидоры": "овощи",
+    "Огурцы": DEFAULT_CATEGORY,
+    "Картофель": "овощи",
+    "Морковь": "овощи",
+    "Лук": "овощи",
+    "Капуста": "овощи",
+    "Перец болгарский": "овощи",
+    "Яблоки": "фрукты",
+    "Бананы": "фрукты",
+    "Апельсины": "фрукты",
+    "Лимоны": "фрукты",
+    "Груши": "фрукты",
+    "Колбаса": "Мясо и птица",
+    "Сосиски": "Мясо и птица",
+    "Курица": "Мясо и птица",
+    "Говядина": "Мясо и птица",
+    "Ветчина": "Мясо и птица",
+    "Апельсиновый сок": "фрукты",
+    "Вода минеральная": "напитки",
+    "Чай зеленый": "напитки",
+    "Кофе": "напитки",
+    "Хлеб белый": "хлеб",
+    "Хлеб черный": "хлеб",
+    "Булочки": DEFAULT_CATEGORY,
+    "Яйца куриные": "яйца",
+}
+
+
+@pytest.fixture(scope="module")
+def product_tree():
+    if not os.path.exists(PRODUCT_TREE_FILE):
+        pytest.skip("нет product_tree_samara.json")
+    return load_product_tree(PRODUCT_TREE_FILE)
+
+
+def tree_categorizer(tree, level):
+    return Categorizer(CategoryTree(tree, level, fallback=PRODUCT_CATEGORIES))
+
+
+def test_seed_products_subcategories(product_tree):
+    categorizer = tree_categorizer(product_tree, "subcategory")
+    assert {name: categorizer.categorize(name) for name in EXPECTED_SUBCATEGORIES} == EXPECTED_SUBCATEGORIES
+
+
+def test_stems_match_only_at_word_start(product_tree):
+    categorizer = tree_categorizer(product_tree, "subcategory")
+    # «блок» из «Блоки питания» не должен находиться внутри «яблоки»
+    assert categorizer.categorize("Яблоки") != "Комплектующие"
+    assert categorizer.categorize("Блоки питания") == "Комплектующие"
+
+
+@pytest.mark.parametrize("level", ["category", "subcategory", "product_group", "product"])
+def test_stored_categories_belong_to_one_level(product_tree, level):
+    categorizer = tree_categorizer(product_tree, level)
+    tree_names = {node["name"] for node in product_tree.iter_nodes()}
+    level_names = {node["name"] for node in product_tree.iter_nodes() if node["type"] == level}
+    for name in EXPECTED_SUBCATEGORIES:
+        category = categorizer.categorize(name)
+        # Название из дерева — только узел нужного уровня; иначе категория запасного словаря
+        assert category in level_names or category not in tree_names, (name, category)
+
+
+def random_names(rng, keywords, count):
+    """Названия из обрывков ключевых слов и случайных букв: много частичных и перекрывающихся совпадений"""
+    alphabet = "абвгдежзийклмнопрстуфхцчшщыэюя "
+    names = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            keyword = rng.choice(keywords)
+            start = rng.randint(0, len(keyword) - 1)
+            parts.append(keyword[start:rng.randint(start + 1, len(keyword))] if rng.random() < 0.5 else keyword)
+            parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3))))
+        name = "".join(parts)
+        names.append(name.upper() if rng.random() < 0.2 else name)
+    return names
+
+
+@pytest.mark.parametrize("seed", [1, 42, 1337])
+def test_matcher_agrees_with_naive(seed):
+    rng = random.Random(seed)
+    # Словарь с короткими пересекающимися ключевыми словами поверх PRODUCT_CATEGORIES
+    categories = {
+        f"категория_{i}": ["".join(rng.choice("абвгд") for _ in range(rng.randint(1, 4))) for _ in range(5)]
+        for i in range(10)
+    }
+    categories.update(PRODUCT_CATEGORIES)
+    keywords = [keyword for words in categories.values() for keyword in words]
+    matcher = CategoryMatcher(categories)
+    names = random_names(rng, keywords, 2000) + list(EXPECTED_SUBCATEGORIES) + ["", "   "]
+    assert matcher.categorize_many(names) == [categorize_naive(name, categories) for name in names]
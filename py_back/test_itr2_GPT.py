@@ -0,0 +1,77 @@
+import io
+import json
+import os
+
+import pytest
+
+from itr2_GPT import generate_knowledge_tree, iter_knowledge_tree_classes, write_knowledge_tree_stream
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_tree_sample.json")
+# Параметры, с которыми исходный генератор записал knowledge_tree_sample.json (см. __main__ в itr2_GPT.py)
+SAMPLE_PARAMS = {
+    "num_classes": 30,
+    "types_per_class_min": 8,
+    "types_per_class_max": 12,
+    "specs_per_type_min": 6,
+    "specs_per_type_max": 10,
+    "details_per_spec_min": 2,
+    "details_per_spec_max": 4,
+    "seed": 1337,
+}
+SMALL_PARAMS = {
+    "num_classes": 5,
+    "types_per_class_min": 2,
+    "types_per_class_max": 4,
+    "specs_per_type_min": 2,
+    "specs_per_type_max": 3,
+    "details_per_spec_min": 1,
+    "details_per_spec_max": 3,
+}
+GENERATED_AT = "2025-01-01T00:00:00Z"
+
+
+def stream(params, indent=None, ndjson=False, generated_at=GENERATED_AT):
+    f = io.StringIO()
+    write_knowledge_tree_stream(f, iter_knowledge_tree_classes(**params), indent, ndjson, generated_at)
+    return f.getvalue()
+
+
+@pytest.fixture(scope="module")
+def sample_text():
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_stream_matches_original_sample(sample_text):
+    # Файл записан исходным генератором (json.dump с indent=2) до потокового режима
+    generated_at = json.loads(sample_text)["сгенерировано"]
+    assert stream(SAMPLE_PARAMS, indent=2, generated_at=generated_at) == sample_text
+
+
+def test_compact_stream_matches_original_sample(sample_text):
+    sample = json.loads(sample_text)
+    expected = json.dumps(sample, ensure_ascii=False)
+    assert stream(SAMPLE_PARAMS, generated_at=sample["сгенерировано"]) == expected
+
+
+@pytest.mark.parametrize("seed", [1, 42, 1337])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_matches_json_dump(seed, indent):
+    params = {**SMALL_PARAMS, "seed": seed}
+    tree = generate_knowledge_tree(**params, generated_at=GENERATED_AT)
+    assert stream(params, indent) == json.dumps(tree, ensure_ascii=False, indent=indent)
+
+
+@pytest.mark.parametrize("seed", [1, 42, 1337])
+def test_ndjson_holds_the_same_tree(seed):
+    params = {**SMALL_PARAMS, "seed": seed}
+    header, *lines = stream(params, ndjson=True).splitlines()
+    tree = generate_knowledge_tree(**params, generated_at=GENERATED_AT)
+    assert {**json.loads(header), "классы": [json.loads(line) for line in lines]} == tree
+
+
+def test_empty_tree():
+    params = {**SMALL_PARAMS, "num_classes": 0, "seed": 42}
+    for indent in (None, 2):
+        tree = generate_knowledge_tree(**params, generated_at=GENERATED_AT)
+        assert stream(params, indent) == json.dumps(tree, ensure_ascii=False, indent=indent)
@@ -0,0 +1,189 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+# Бинарный снимок дерева (товаров или знаний) для mmap только на чтение.
+#
+# Раскладка файла:
+#   MAGIC (8 байт) | версия формата, длина заголовка (<II) | заголовок JSON | выравнивание до 8
+#   | секции: сырые буферы массивов, каждая выровнена на 8 байт
+# Заголовок описывает секции {имя: [typecode, смещение от начала данных, число элементов]},
+# порядок байт и произвольные метаданные. Строки лежат двумя секциями:
+# string_offsets (q, n + 1 элементов) и string_data (UTF-8 подряд), плюс string_order —
+# индексы строк, отсортированные по байтам, для двоичного поиска.
+MAGIC = b"TREESNAP"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+_PREFIX = struct.Struct("<II")
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_snapshot(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_snapshot(
+    path: str,
+    tree_kind: str,
+    columns: Mapping[str, array],
+    strings: Sequence[str],
+    meta: Optional[Dict[str, Any]] = None,
+):
+    """
+    Пишет снимок: колонки (array.array) как есть, строки — таблицей смещений.
+    Файл пишется во временный и подменяется атомарно, так что читатели,
+    уже отобразившие старый снимок, его не теряют.
+    """
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = array("q", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    sections: Dict[str, Any] = dict(columns)
+    sections["string_offsets"] = string_offsets
+    sections["string_data"] = array("B", b"".join(encoded))
+    sections["string_order"] = array("i", sorted(range(len(encoded)), key=encoded.__getitem__))
+
+    layout = {}
+    offset = 0
+    for name, column in sections.items():
+        layout[name] = [column.typecode, offset, len(column)]
+        offset = _aligned(offset + len(column) * column.itemsize)
+
+    header = json.dumps({
+        "tree_kind": tree_kind,
+        "byteorder": sys.byteorder,
+        "sections": layout,
+        "meta": meta or {},
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + _PREFIX.size + len(header))
+
+    # Своё временное имя у каждого процесса: воркеры могут пересобирать снимок одновременно
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + _PREFIX.pack(FORMAT_VERSION, len(header)) + header)
+        for name, column in sections.items():
+            f.write(b"\0" * (data_start + layout[name][1] - f.tell()))
+            column.tofile(f)
+        f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+    os.replace(tmp_path, path)
+
+
+class SnapshotStrings:
+    """Таблица строк снимка: строка декодируется из отображённого буфера при обращении"""
+
+    def __init__(self, offsets: memoryview, data: memoryview, order: memoryview):
+        self._offsets = offsets
+        self._data = data
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _bytes(self, index: int) -> bytes:
+        return bytes(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+    def __getitem__(self, index: int) -> str:
+        return self._bytes(index).decode("utf-8")
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def find(self, value: str) -> Optional[int]:
+        """Индекс строки или None — двоичный поиск по string_order"""
+        target = value.encode("utf-8")
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(self._order[middle]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._order) and self._bytes(self._order[low]) == target:
+            return self._order[low]
+        return None
+
+
+class Snapshot:
+    """
+    Снимок, отображённый в память только на чтение.
+
+    Колонки — memoryview поверх mmap с тем же typecode, что у исходных
+    array.array: индексация не копирует данные, а страницы файла делятся
+    между всеми процессами через page cache.
+    """
+
+    def __init__(self, path: str, tree_kind: Optional[str] = None):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._open(tree_kind)
+        except BaseException:
+            # Сначала отпускаются уже созданные memoryview, иначе mmap не закрыть
+            self.close()
+            raise
+
+    def _open(self, tree_kind: Optional[str]):
+        buffer = memoryview(self._mmap)
+        self._views = [buffer]
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError(f"{self.path}: не снимок дерева")
+        version, header_length = _PREFIX.unpack_from(buffer, len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path}: версия формата {version}, поддерживается {FORMAT_VERSION}")
+        header_start = len(MAGIC) + _PREFIX.size
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]).decode("utf-8"))
+        if header["byteorder"] != sys.byteorder:
+            raise SnapshotError(f"{self.path}: порядок байт {header['byteorder']}, у процесса {sys.byteorder}")
+        if tree_kind is not None and header["tree_kind"] != tree_kind:
+            raise SnapshotError(f"{self.path}: снимок {header['tree_kind']}, ожидался {tree_kind}")
+
+        self.tree_kind = header["tree_kind"]
+        self.meta = header["meta"]
+        data_start = _aligned(header_start + header_length)
+        self.columns: Dict[str, memoryview] = {}
+        for name, (typecode, offset, count) in header["sections"].items():
+            itemsize = array(typecode).itemsize
+            start = data_start + offset
+            view = buffer[start:start + count * itemsize].cast(typecode)
+            self._views.append(view)
+            self.columns[name] = view
+        self.strings = SnapshotStrings(
+            self.columns.pop("string_offsets"),
+            self.columns.pop("string_data"),
+            self.columns.pop("string_order"),
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self._mmap)
+
+    def close(self):
+        """Отпускает отображение; колонки и строки снимка после этого недоступны"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.columns = {}
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
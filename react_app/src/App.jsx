@@ -107,6 +107,30 @@ const Fridge = () => {
     loadCategories();
   }, []);
 
+  // Изменения от других клиентов приходят из ленты изменений (Server-Sent Events)
+  useEffect(() => {
+    const source = new EventSource(`${PYTHON_API_URL}/${RESOURCE}/changes/stream`);
+
+    source.onmessage = (event) => {
+      const change = JSON.parse(event.data);
+      if (change.type === 'resync') {
+        // События пропущены (обрыв или переполнение очереди) — перечитываем список целиком
+        fetchItems();
+        return;
+      }
+      const changed = change.item;
+      if (change.type === 'delete') {
+        setItems(prev => prev.filter(item => item.id !== changed.id));
+      } else {
+        setItems(prev => prev.some(item => item.id === changed.id)
+          ? prev.map(item => item.id === changed.id ? { ...item, ...changed } : item)
+          : [changed, ...prev]);
+      }
+    };
+
+    return () => source.close();
+  }, []);
+
   const toggleDoor = () => {
     setIsOpen(!isOpen);
   };
@@ -137,7 +161,10 @@ const Fridge = () => {
       }
       
       const newItem = await response.json();
-      setItems([newItem, ...items]);
+      // Событие ленты о той же вставке могло прийти раньше ответа — не дублируем товар
+      setItems(prev => prev.some(item => item.id === newItem.id)
+        ? prev.map(item => item.id === newItem.id ? newItem : item)
+        : [newItem, ...prev]);
       setNewItemName('');
       setError('');
       console.log('Продукт добавлен через Python API:', newItem);
@@ -162,7 +189,7 @@ const removeItem = async (id) => {
     }
     
     const result = await response.json();
-    setItems(items.filter(item => item.id !== id));
+    setItems(prev => prev.filter(item => item.id !== id));
     setError('');
     console.log('Продукт удален через Python API:', result.message);
     
@@ -184,7 +211,7 @@ const toggleItemPosition = async (id) => {
     }
     
     const updatedItem = await response.json();
-    setItems(items.map(item => 
+    setItems(prev => prev.map(item => 
       item.id === id ? updatedItem : item
     ));
     setError('');